@@ -0,0 +1,41 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = os.path.join(ROOT, "examples")
+# the scripts of the package import the modules from the directory traj_analysis
+sys.path.insert(0, os.path.join(ROOT, "traj_analysis"))
+
+import mdtraj as md
+import numpy as np
+import pytest
+from packages.synthetic import write_synthetic_trajectory
+from traj_analysis import analyze_trajectory
+
+# synthetic trajectory of the regression checks: the trefoil is tied in the frames [100, 250) and from the frame 350
+N_FRAMES, N_BEADS, EVENTS = 500, 50, [(100, 250), (350, None)]
+
+
+@pytest.fixture(scope="session")
+def synthetic(tmp_path_factory):
+    """
+    Synthetic trajectory as the frame store (.npy) and as the CA-only PDB file, with its ground truth.
+    """
+    directory = tmp_path_factory.mktemp("synthetic")
+    store = str(directory / "knots.npy")
+    truth = write_synthetic_trajectory(store, N_FRAMES, N_BEADS, EVENTS)
+    topology = md.Topology()
+    chain = topology.add_chain()
+    for _ in range(N_BEADS):
+        topology.add_atom("CA", md.element.carbon, topology.add_residue("ALA", chain))
+    pdb = str(directory / "knots.pdb")
+    md.Trajectory(np.load(store), topology).save_pdb(pdb)
+    return {"store": store, "pdb": pdb, "truth": truth}
+
+
+@pytest.fixture(scope="session")
+def baseline(synthetic):
+    """
+    Result of the analysis of the synthetic trajectory with the default options.
+    """
+    return analyze_trajectory(synthetic["store"], True)
@@ -0,0 +1,40 @@
+import csv
+import os
+
+import traj_analysis
+from conftest import EXAMPLES
+
+
+def copy_trajectory(directory, name):
+    path = directory / name
+    path.write_bytes(open(os.path.join(EXAMPLES, "traj.pdb"), "rb").read())
+    return str(path)
+
+
+def test_full_output_columns(tmp_path):
+    copy_trajectory(tmp_path, "a.pdb")
+    rows = []
+    for full_output in (False, True):
+        output = str(tmp_path / f"results_{full_output}.csv")
+        traj_analysis.analyze_batch(str(tmp_path / "*.pdb"), nat_knotcore=(13, 80), output=output,
+                                    full_output=full_output)
+        with open(output, newline="") as csv_file:
+            rows.append([row[3:] for row in csv.reader(csv_file)])
+    assert rows[0] == rows[1]
+    assert rows[0][1] == ["402", "3_1", "", "10", "80", "0", "1"]
+
+
+def test_crashed_job_does_not_stop_batch(tmp_path, monkeypatch):
+    analyze_trajectory = traj_analysis.analyze_trajectory
+
+    def crashing(file, *args, **kwargs):
+        if file.endswith("crash.pdb"):
+            os._exit(1)
+        return analyze_trajectory(file, *args, **kwargs)
+
+    monkeypatch.setattr(traj_analysis, "analyze_trajectory", crashing)
+    good, crash = copy_trajectory(tmp_path, "good.pdb"), copy_trajectory(tmp_path, "crash.pdb")
+    results = {result["file"]: result for result in
+               traj_analysis.analyze_batch(str(tmp_path / "*.pdb"), nat_knotcore=(13, 80), workers=2)}
+    assert results[good]["error"] is None and list(results[good]["knot_dict"]) == [402]
+    assert results[crash]["knot_dict"] is None and results[crash]["error"].startswith("BrokenProcessPool")
@@ -0,0 +1,43 @@
+import pickle
+
+import pytest
+from packages.checkpoint import Checkpoint
+from packages.traj import Traj
+from traj_analysis import analyze_trajectory
+
+
+def test_resumed_analysis_gives_baseline(synthetic, baseline, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / "state.pkl")
+    calculate_knotcore = Traj.calculate_knotcore
+
+    def interrupted(self):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(Traj, "calculate_knotcore", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        analyze_trajectory(synthetic["store"], True, checkpoint=checkpoint)
+    monkeypatch.setattr(Traj, "calculate_knotcore", calculate_knotcore)
+    # the search is not repeated, only the knot types of the stability checks are calculated again
+    knot_dict, report = analyze_trajectory(synthetic["store"], True, checkpoint=checkpoint, resume=True,
+                                           profile=True)
+    assert knot_dict == baseline
+    assert "searched_structure" not in report["stages"]
+
+
+def test_mismatched_checkpoint_is_rejected(tmp_path):
+    path = tmp_path / "state.pkl"
+    Checkpoint(str(path)).save({"frames": 10}, {})
+    with pytest.raises(ValueError, match="different parameters"):
+        Checkpoint(str(path), resume=True).load({"frames": 20})
+    path.write_bytes(b"not a checkpoint")
+    with pytest.raises(ValueError, match="not a checkpoint"):
+        Checkpoint(str(path), resume=True).load({"frames": 10})
+
+
+def test_progress_is_throttled(tmp_path):
+    path = tmp_path / "state.pkl"
+    checkpoint = Checkpoint(str(path), interval=3600)
+    assert checkpoint.save({}, {"stage": 1})
+    assert not checkpoint.save({}, {"stage": 1, "progress": 1}, force=False)
+    assert pickle.loads(path.read_bytes()) == ({}, {"stage": 1})
+    assert checkpoint.save({}, {"stage": 2})
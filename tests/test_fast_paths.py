@@ -0,0 +1,82 @@
+import os
+
+import pytest
+from benchmark import check_results
+from packages.frames import convert_structure
+from packages.store import ResultStore
+from traj_analysis import analyze_trajectory
+
+
+def test_baseline_finds_the_events(synthetic, baseline):
+    assert check_results(baseline, synthetic["truth"], tolerance=10, core_tolerance=10) == []
+
+
+@pytest.mark.parametrize("options", [
+    {"workers": 2},
+    {"knotcore_search": "gallop"},
+    {"knotcore_search": "batch"},
+    {"warm_start": True},
+    {"prefilter": True},
+    {"knot_engine": "numpy"},
+    {"cache_size": 16},
+], ids=lambda options: ",".join(f"{key}={value}" for key, value in options.items()))
+def test_options_give_baseline(synthetic, baseline, options):
+    assert analyze_trajectory(synthetic["store"], True, **options) == baseline
+
+
+def test_profiled_analysis_gives_baseline(synthetic, baseline):
+    knot_dict, report = analyze_trajectory(synthetic["store"], True, profile=True)
+    assert knot_dict == baseline
+    assert report["counts"]["knot_type"] > 0
+
+
+def test_store_gives_baseline(synthetic, baseline, tmp_path):
+    store = str(tmp_path / "knots.sqlite")
+    assert analyze_trajectory(synthetic["store"], True, store=store) == baseline
+    # the second analysis reads all knot types and knot cores from the store
+    knot_dict, report = analyze_trajectory(synthetic["store"], True, store=store, profile=True)
+    assert knot_dict == baseline
+    assert report["counts"].get("alexander", 0) == 0
+    ResultStore(store).close()
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True, "chunk_size": 64}, {"frame_index": True, "chunk_size": 64}],
+                         ids=["ca_reader", "lazy", "frame_index"])
+def test_pdb_readers_give_baseline(synthetic, baseline, options, tmp_path):
+    pdb = tmp_path / "knots.pdb"
+    pdb.write_bytes(open(synthetic["pdb"], "rb").read())
+    assert analyze_trajectory(str(pdb), True, **options) == baseline
+
+
+def test_converted_store_gives_baseline(synthetic, baseline, tmp_path):
+    store = convert_structure(synthetic["pdb"], output=str(tmp_path / "converted.npy"))
+    assert analyze_trajectory(store, True) == baseline
+    os.remove(synthetic["pdb"] + ".frameidx.npy")
+
+
+def test_bisect_finds_the_events(synthetic, baseline):
+    # the fixed search checks the windows of 10 frames, the bisection finds the exact frames of the events, so both
+    # are only compared with the ground truth
+    knot_dict = analyze_trajectory(synthetic["store"], True, search_mode="bisect")
+    assert check_results(knot_dict, synthetic["truth"], tolerance=0, core_tolerance=10) == []
+    assert [values[0] for values in knot_dict.values()] == [values[0] for values in baseline.values()]
+
+
+def test_adaptive_closures_find_the_events(synthetic, baseline):
+    # the random closures give other knot core ranges than the deterministic one, so only the found frames are
+    # compared with the baseline
+    knot_dict = analyze_trajectory(synthetic["store"], True, closure=2, adaptive=True)
+    assert check_results(knot_dict, synthetic["truth"], tolerance=10, core_tolerance=10) == []
+    assert list(knot_dict) == list(baseline)
+
+
+@pytest.mark.parametrize("options", [{}, {"knot_engine": "numpy"}], ids=["topoly", "numpy"])
+def test_timeline_gives_baseline(synthetic, baseline, options):
+    assert analyze_trajectory(synthetic["store"], True, timeline=True, **options) == baseline
+
+
+def test_merged_shards_give_baseline(synthetic, baseline, tmp_path):
+    paths = [str(tmp_path / f"shard{start}.pkl") for start in (0, 250)]
+    for start, path in zip((0, 250), paths):
+        analyze_trajectory(synthetic["store"], True, shard=(start, start + 250), shard_output=path)
+    assert analyze_trajectory(synthetic["store"], True, shards=paths) == baseline
@@ -0,0 +1,52 @@
+import os
+
+import mdtraj as md
+import numpy as np
+from conftest import EXAMPLES
+from packages.frames import LazyFrames, convert_structure, iter_pdb, open_frame_store, read_ca_pdb
+
+TRAJECTORY = os.path.join(EXAMPLES, "traj.pdb")
+
+
+def test_ca_pdb_reader_matches_mdtraj():
+    expected = md.load_pdb(TRAJECTORY).xyz
+    assert np.array_equal(read_ca_pdb(TRAJECTORY), expected)
+    assert np.array_equal(np.concatenate(list(iter_pdb(TRAJECTORY, chunk_size=100))), expected)
+
+
+def test_indexed_frames_match_mdtraj(tmp_path):
+    trajectory = tmp_path / "traj.pdb"
+    trajectory.write_bytes(open(TRAJECTORY, "rb").read())
+    frames = LazyFrames(str(trajectory), chunk_size=100, frame_index=True)
+    assert np.array_equal(np.stack([frames[i] for i in range(250, 350)]), md.load_pdb(TRAJECTORY).xyz[250:350])
+
+
+def test_lazy_frames_stream_pdb(monkeypatch):
+    # the PDB files must not be loaded at once by mdtraj.iterload
+    monkeypatch.setattr(md, "iterload", None)
+    structure = os.path.join(EXAMPLES, "2efv.pdb")
+    frames = LazyFrames(structure, chunk_size=1)
+    assert np.array_equal(frames[0], md.load_pdb(structure).xyz[0])
+    frames = LazyFrames(TRAJECTORY, chunk_size=50)
+    assert len(frames) == 601 and np.array_equal(frames[420], md.load_pdb(TRAJECTORY).xyz[420])
+
+
+def test_alternate_locations_like_mdtraj(tmp_path):
+    atoms = [line for line in open(os.path.join(EXAMPLES, "2efv.pdb")).read().splitlines()
+             if line.startswith("ATOM")][:12]
+    moved = f"{float(atoms[3][30:38]) + 1:8.3f}"
+    alternate = [atoms[3][:16] + "A" + atoms[3][17:], atoms[3][:16] + "B" + atoms[3][17:30] + moved + atoms[3][38:]]
+    structure = tmp_path / "alternate.pdb"
+    structure.write_text("\n".join(atoms[:3] + alternate + atoms[4:] + ["END", ""]))
+    assert np.array_equal(next(iter_pdb(str(structure))), md.load_pdb(str(structure)).xyz)
+
+
+def test_convert_pdb_without_full_load(monkeypatch, tmp_path):
+    structure = os.path.join(EXAMPLES, "2efv.pdb")
+    expected = md.load_pdb(structure)
+    expected = expected.xyz[:, expected.topology.select("name CA")]
+    monkeypatch.setattr(md, "iterload", None)
+    copy = tmp_path / "2efv.pdb"
+    copy.write_bytes(open(structure, "rb").read())
+    store = convert_structure(str(copy), selection="name CA", chunk_size=1)
+    assert np.array_equal(open_frame_store(store), expected)
@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+from conftest import EXAMPLES
+from packages.frames import read_ca_pdb
+from packages.geometry import close_chains, reduce_polygon, unknot_certified
+from packages.traj import chain_knot_type
+
+
+def test_certified_frames_are_unknotted():
+    lx = read_ca_pdb(os.path.join(EXAMPLES, "traj.pdb"))[::5]
+    certified = [i for i in range(len(lx)) if unknot_certified(lx[i][::2], 1)]
+    assert len(certified) > 0
+    assert all(chain_knot_type(lx[i], 1, 15, 20) == '0_1' for i in certified)
+
+
+def test_knot_is_not_reduced():
+    # trefoil (2, 3) torus knot, at least 6 vertices are left after the reduction
+    angles = np.linspace(0, 2 * np.pi, 60, endpoint=False)
+    trefoil = np.stack([np.sin(angles) + 2 * np.sin(2 * angles), np.cos(angles) - 2 * np.cos(2 * angles),
+                        -np.sin(3 * angles)], axis=1)
+    assert len(reduce_polygon(trefoil)) >= 6
+    assert not unknot_certified(trefoil, 1)
+
+
+def test_unknotted_polygon_is_reduced():
+    angles = np.linspace(0, 2 * np.pi, 40, endpoint=False)
+    circle = np.stack([np.cos(angles), np.sin(angles), 0.3 * np.sin(2 * angles)], axis=1)
+    assert len(reduce_polygon(circle)) <= 5
+    assert unknot_certified(circle[:-3], 1)
+    assert not close_chains(circle[None, :-3])[1][0]
@@ -0,0 +1,19 @@
+import os
+
+import mdtraj as md
+from conftest import EXAMPLES
+from packages.plot import Plot
+from packages.traj import Traj
+
+
+def test_last_frame_is_sampled_for_the_last_knot(tmp_path):
+    lx = md.load(os.path.join(EXAMPLES, "traj.pdb")).xyz
+    trajectory = Traj(lx, lx.shape[1] - 1, len(lx) - 1, 10, 10, 100, True, (13, 80), 1, 20, 15, False)
+    knot_dict = trajectory.calculate(False)
+    plot = Plot(trajectory, str(tmp_path / "plot"), 100, False)
+    plot.prepare_data_to_plot()
+    # the knot stays until the end of the trajectory, the last frame is sampled under its knotting frame
+    frame = trajectory.frame_list[-1]
+    assert frame in knot_dict
+    assert len(plot.plot_dict[frame]) == 11 + len(range(frame + 110, len(lx) - 1, 100)) + 1
+    trajectory.pool.close()
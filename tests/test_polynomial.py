@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+from conftest import EXAMPLES
+from topoly.invariants import find_matching_knot
+from packages.frames import read_ca_pdb
+from packages.polynomial import KNOT_TYPES, POLYNOMIALS, UNKNOWN_KNOT, alexander_polynomials, knot_codes
+from packages.traj import chain_knot_type
+
+
+def test_engine_agrees_with_topoly():
+    lx = read_ca_pdb(os.path.join(EXAMPLES, "traj.pdb"))[::3]
+    codes = knot_codes(lx[:, ::2])
+    resolved = np.flatnonzero(codes != UNKNOWN_KNOT)
+    assert len(resolved) > len(lx) // 2
+    assert {KNOT_TYPES[codes[i]] for i in resolved} == {'0_1', '3_1'}
+    assert all(KNOT_TYPES[codes[i]] == chain_knot_type(lx[i], 1, 15, 20) for i in resolved)
+
+
+def test_table_matches_topoly():
+    for polynomial, code in POLYNOMIALS.items():
+        assert find_matching_knot(' '.join(map(str, polynomial)), 'Alexander') == KNOT_TYPES[code]
+    # knots, whose |Δ(-1)| and |Δ(exp(2πi/3))| are the same as of the knots in the table
+    for polynomial in ((1, -1, 0, 1, -1, 1, -1, 1, 0, -1, 1), (1, 1, -3, 3, -3, 1, 1)):
+        assert polynomial not in POLYNOMIALS
+
+
+def test_polynomial_of_trefoil():
+    angles = np.linspace(0, 2 * np.pi, 60, endpoint=False)
+    trefoil = np.stack([np.sin(angles) + 2 * np.sin(2 * angles), np.cos(angles) - 2 * np.cos(2 * angles),
+                        -np.sin(3 * angles)], axis=1)
+    assert alexander_polynomials(trefoil[None]) == [(1, -1, 1)]
@@ -0,0 +1,9 @@
+import numpy as np
+import pytest
+from packages.traj import Traj
+
+
+def test_unknown_search_mode_is_rejected():
+    lx = np.zeros((30, 10, 3), dtype=np.float32)
+    with pytest.raises(ValueError, match="search mode"):
+        Traj(lx, 9, 29, 10, 10, 100, True, None, 1, 20, 15, False, search_mode='bisection')
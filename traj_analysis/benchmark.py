@@ -0,0 +1,171 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+from traj_analysis import analyze_trajectory
+from packages.traj import *
+from packages.plot import Plot
+from packages.frames import open_frame_store
+from packages.synthetic import synthetic_truth, write_synthetic_trajectory
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def benchmark_events(n_frames):
+    """
+    Returns: the knotting and unknotting frames of the synthetic trajectory of the given length: the knot tied for
+             1/5 of the trajectory, and the knot tied again, which stays until the end.
+    """
+    return [(n_frames // 5, 2 * n_frames // 5), (3 * n_frames // 5, None)]
+
+
+def check_results(knot_dict, truth, tolerance=10, core_tolerance=10):
+    """
+    Function compares the results of analyze_trajectory with the ground truth of the synthetic trajectory.
+
+    Returns: list of the found differences (empty if the results are correct).
+    """
+    errors = []
+    knot_dict = knot_dict or {}
+    if len(knot_dict) != len(truth["events"]):
+        errors.append(f"{len(knot_dict)} knotting events found, {len(truth['events'])} expected")
+    for (frame, values), (knotting, unknotting) in zip(sorted(knot_dict.items()), truth["events"]):
+        if abs(frame - knotting) > tolerance:
+            errors.append(f"knotting in frame {frame}, expected {knotting}")
+        if values[0] != truth["knot_type"]:
+            errors.append(f"knot type {values[0]} in frame {frame}, expected {truth['knot_type']}")
+        if (values[1] is None) != (unknotting is None) or \
+                (unknotting is not None and abs(values[1] - unknotting) > tolerance):
+            errors.append(f"unknotting in frame {values[1]}, expected {unknotting}")
+        core = values[2]
+        if not isinstance(core, tuple) or abs(core[0] - truth["knot_core"][0]) > core_tolerance or \
+                abs(core[1] - truth["knot_core"][1]) > core_tolerance:
+            errors.append(f"knot core {core} in frame {frame}, expected {truth['knot_core']}")
+    return errors
+
+
+def benchmark_case(path, n_frames, n_beads, truth, plot_scope=100, **options):
+    """
+    Function times the analysis of one synthetic trajectory: the whole analyze_trajectory (with its stages), the
+    search of the knotting moments (searched_structure), the knot core of one knotted frame (find_knotcore_simple)
+    and the preparation of the data of the plot.
+
+    Returns: dictionary with the times (s), the numbers of evaluations per frame and the differences from the ground
+             truth.
+    """
+    result = {"frames": n_frames, "beads": n_beads}
+
+    start = time.perf_counter()
+    knot_dict, report = analyze_trajectory(path, True, profile=True, **options)
+    result["analyze_trajectory"] = time.perf_counter() - start
+    result["stages"] = report["stages"]
+    result["knot_type_per_frame"] = report["counts"].get("knot_type", 0) / n_frames
+    result["alexander_per_frame"] = report["counts"].get("alexander", 0) / n_frames
+    result["peak_rss_mb"] = report["peak_rss_mb"]
+    result["peak_rss_workers_mb"] = report["peak_rss_workers_mb"]
+    result["errors"] = check_results(knot_dict, truth)
+
+    lx = open_frame_store(path)
+    trajectory = Traj(lx, n_beads - 1, len(lx) - 1, 10, 10, 100, True, None, options.get("closure", 1), 20, 15, False,
+                      workers=options.get("workers", 1), knotcore_search=options.get("knotcore_search", "linear"),
+                      search_mode=options.get("search_mode", "fixed"), knot_engine=options.get("knot_engine", "topoly"),
+                      adaptive=options.get("adaptive", False))
+    try:
+        start = time.perf_counter()
+        trajectory.searched_structure(True)
+        trajectory.searched_structure(False)
+        result["searched_structure"] = time.perf_counter() - start
+        result["search_evaluations_per_frame"] = trajectory.cache.evaluations / n_frames
+
+        knotted = truth["events"][0][0] + 1
+        start = time.perf_counter()
+        core = find_knotcore_simple(lx[knotted], closure=options.get("closure", 1),
+                                    search=options.get("knotcore_search", "linear"),
+                                    adaptive=options.get("adaptive", False))
+        result["find_knotcore_simple"] = time.perf_counter() - start
+        if core is None or abs(core[0] - truth["knot_core"][0]) > 10 or abs(core[1] - truth["knot_core"][1]) > 10:
+            result["errors"].append(f"find_knotcore_simple gave {core}, expected {truth['knot_core']}")
+
+        trajectory.calculate(False)
+        plot = Plot(trajectory, "benchmark", plot_scope, False)
+        start = time.perf_counter()
+        plot.prepare_data_to_plot()
+        result["prepare_data_to_plot"] = time.perf_counter() - start
+    finally:
+        trajectory.pool.close()
+    return result
+
+
+def run_benchmark(beads=(50, 200, 1000), frames=(1000, 10000), data_dir=None, output=None, **options):
+    """
+    Function runs the benchmark on the synthetic trajectories of all combinations of the chain lengths and the
+    trajectory lengths. The trajectories are generated in data_dir (and reused, if they already exist there) or in
+    a temporary directory.
+
+    Args:
+        beads (list of int, optional):
+                The numbers of beads of the chains.
+                Default: (50, 200, 1000).
+        frames (list of int, optional):
+                The numbers of frames of the trajectories, at least 1000.
+                Default: (1000, 10000).
+        data_dir (str, optional):
+                The directory of the generated trajectories.
+                Default: None, a temporary directory.
+        output (str, optional):
+                The .json file, where the results are saved.
+                Default: None.
+        options:
+                The options of analyze_trajectory (e.g. workers, knotcore_search, search_mode, knot_engine).
+
+    Returns: list of the results of the cases (see benchmark_case).
+    """
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = data_dir if data_dir is not None else temporary
+        os.makedirs(directory, exist_ok=True)
+        results = []
+        for n_frames in frames:
+            for n_beads in beads:
+                path = os.path.join(directory, f"synthetic_{n_frames}_{n_beads}.npy")
+                events = benchmark_events(n_frames)
+                if not os.path.exists(path):
+                    write_synthetic_trajectory(path, n_frames, n_beads, events)
+                truth = synthetic_truth(n_beads, events)
+                result = benchmark_case(path, n_frames, n_beads, truth, **options)
+                results.append(result)
+                print(f"{n_frames:>8} frames {n_beads:>5} beads: analyze_trajectory "
+                      f"{result['analyze_trajectory']:.2f} s, searched_structure {result['searched_structure']:.2f} s "
+                      f"({result['search_evaluations_per_frame']:.4f} evaluations/frame), find_knotcore_simple "
+                      f"{result['find_knotcore_simple']:.3f} s, prepare_data_to_plot "
+                      f"{result['prepare_data_to_plot']:.2f} s, "
+                      f"{'OK' if not result['errors'] else 'ERRORS: ' + '; '.join(result['errors'])}")
+
+    if output is not None:
+        with open(output, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the analysis on synthetic trajectories with known knotting'
+                                                 ' and unknotting frames.')
+    parser.add_argument('-b', '--beads', type=int, nargs='+', default=[50, 200, 1000],
+                        help='Numbers of beads of the chains (50 to 1000).')
+    parser.add_argument('-n', '--frames', type=int, nargs='+', default=[1000, 10000],
+                        help='Numbers of frames of the trajectories (1000 to 1000000).')
+    parser.add_argument('-d', '--data_dir', type=str, default=None,
+                        help='Directory, where the synthetic trajectories are generated and reused. By default a'
+                             ' temporary directory.')
+    parser.add_argument('-r', '--output', type=str, default=None, help='JSON file with the results.')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of processes of the analysis.')
+    parser.add_argument('--knotcore_search', choices=['linear', 'gallop', 'batch'], default='linear',
+                        help='Method of searching the knot core boundaries.')
+    parser.add_argument('--search_mode', choices=['fixed', 'bisect'], default='fixed',
+                        help='Search of the knotting moments.')
+    parser.add_argument('--knot_engine', choices=['topoly', 'numpy'], default='topoly',
+                        help='Calculate the knot types by topoly or by the built-in NumPy engine.')
+
+    args = parser.parse_args()
+    run_benchmark(args.beads, args.frames, args.data_dir, args.output, workers=args.workers,
+                  knotcore_search=args.knotcore_search, search_mode=args.search_mode, knot_engine=args.knot_engine)
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+from packages.frames import convert_structure
+import argparse
+
+
+def convert_trajectory(file, top_file=None, output=None, selection=None, chunk_size=1000):
+    """
+    Function converts the trajectory into the binary frame store (.npy file with float32 coordinates of all frames).
+    The store can be passed to analyze_trajectory instead of the trajectory, then it is memory-mapped, so the analysis
+    starts almost instantly and the frames are read from the disk only when they are used.
+
+    Args:
+        file (str):
+                The path to the structure in accepted format: .pdb, .xyz or .xtc.
+        top_file (str, optional):
+                If the file is not given in .pdb format, it is required to specify an extra file with the topology.
+                Default: None.
+        output (str, optional):
+                The path to the frame store.
+                Default: None, the path of the trajectory with the .npy extension.
+        selection (str, optional):
+                Example: 'name CA'
+                mdtraj atom selection of the atoms, which are written to the store.
+                Default: None, all atoms.
+        chunk_size (int, optional):
+                The number of frames read at once.
+                Default: 1000.
+
+    Returns: The path to the frame store.
+    """
+    return convert_structure(file, top_file, output, selection, chunk_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert the trajectory into the binary frame store.')
+    parser.add_argument('file', type=str, help='Path to the structure file in accepted format: .pdb, .xyz or .xtc.')
+    parser.add_argument('-o', '--top_file', type=str, default=None,
+                        help='Path to a PDB file, a trajectory, or a topology'
+                             ' to supply information for non-PDB formats of the main file.')
+    parser.add_argument('-O', '--output', type=str, default=None,
+                        help='Path to the frame store. By default the path of the trajectory with the .npy extension.')
+    parser.add_argument('-a', '--selection', type=str, default=None,
+                        help="Atom selection (mdtraj syntax, e.g. 'name CA') of the atoms written to the store.")
+    parser.add_argument('-k', '--chunk_size', type=int, default=1000, help='Number of frames read at once.')
+
+    args = parser.parse_args()
+    print(convert_trajectory(args.file, args.top_file, args.output, args.selection, args.chunk_size))
@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+from packages.plot import Plot
+import argparse
+
+
+def draw_saved_plot(file, plot_filename="knotcore_plot", debug=False, headless=False):
+    """
+    Function draws the knot core plot from the plot data file saved by analyze_trajectory (plot_data), without the
+    trajectory and without calculating the knot cores again.
+
+    Args:
+        file (str):
+                The path to the plot data file (.npz).
+        plot_filename (str, optional):
+                The name of the file with the plot.
+                Default: 'knotcore_plot'.
+        debug (bool, optional):
+                The debug mode.
+                Default: False.
+        headless (bool, optional):
+                If True, the plot is only written to the html file, without opening it.
+                Default: False.
+
+    Returns: The results of the analysis saved in the file (knot_dict).
+    """
+    plot = Plot.from_file(file, plot_filename, debug, headless)
+    if len(plot.knot_dict) != 0:
+        plot.draw_plot()
+    elif debug:
+        print("The file does not contain any knots. \nNothing to plot.")
+    return plot.knot_dict
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Draw the knot core plot from the plot data file.')
+    parser.add_argument('file', type=str, help='Path to the plot data file (.npz) saved with --plot_data.')
+    parser.add_argument('-p', '--plot_filename', type=str, default='knotcore_plot', help='Name of the plot file.')
+    parser.add_argument('-e', '--debug', action='store_true', help='Enable debug mode.')
+    parser.add_argument('--headless', action='store_true',
+                        help='Only write the plot to the html file, without opening it.')
+
+    args = parser.parse_args()
+    print(draw_saved_plot(args.file, args.plot_filename, args.debug, args.headless))
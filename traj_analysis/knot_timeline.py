@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+from traj_analysis import load_trajectory
+from packages.traj import *
+from packages.store import ResultStore
+from packages.frames import LazyFrames
+import argparse
+import json
+import numpy as np
+
+
+def knot_timeline(file, stride=1, workers=1, top_file=None, closure=1, tries=20, max_cross=15, cache_size=None,
+                  store=None, lazy=False, chunk_size=1000, frame_index=False, prefilter=False, knot_engine='topoly',
+                  adaptive=False, output=None):
+    """
+    Function calculates the knot type of every (or every stride-th) frame of the trajectory. The frames are processed
+    in chunks, the knot types of every chunk are calculated in the pool of workers processes (or at once by the
+    built-in engine). The timeline can be used for the statistics of the whole trajectory, e.g. the fraction of the
+    knotted frames.
+
+    Args:
+        file (str):
+                The path to the trajectory (see analyze_trajectory).
+        stride (int, optional):
+                Every stride-th frame is calculated. Only the timeline of every frame (stride 1) can be used by the
+                analysis (see analyze_trajectory).
+                Default: 1.
+        workers (int, optional):
+                The number of processes, which calculate the knot types.
+                Default: 1.
+        top_file, closure, tries, max_cross, cache_size, store, lazy, chunk_size, frame_index, prefilter, knot_engine,
+        adaptive:
+                The same as in analyze_trajectory. The knot types are shared with the analysis through the persistent
+                store.
+        output (str, optional):
+                The path to the .npz file, where the timeline is saved (the arrays codes, knot_types and frames, and
+                the parameters of the knot types, see Traj.timeline_params).
+                Default: None.
+
+    Returns:
+        Tuple (codes, knot types): the uint8 array with the code of the knot type of every calculated frame (frames 0,
+        stride, 2 * stride, ...) and the tuple of the names of the codes (the code is the index in the tuple,
+        UNKNOWN_KNOT is the code of the knot types not in the tuple).
+        None, if the trajectory could not be loaded.
+    """
+    lx, n_atoms = load_trajectory(file, top_file, lazy, chunk_size, frame_index)
+    if lx is None:
+        return None
+
+    result_store = None
+    if store:
+        result_store = ResultStore(ResultStore.sidecar_path(file) if store is True else store)
+
+    trajectory = Traj(lx, n_atoms - 1, len(lx) - 1, 10, 10, 100, True, None, closure, tries, max_cross, False,
+                      cache_size, result_store, workers, prefilter=prefilter, knot_engine=knot_engine,
+                      adaptive=adaptive)
+    try:
+        codes, knot_types = trajectory.knot_timeline(stride)
+        params = trajectory.timeline_params(stride)
+    finally:
+        trajectory.pool.close()
+        if isinstance(lx, LazyFrames):
+            lx.close()
+        if result_store is not None:
+            result_store.close()
+
+    if output is not None:
+        np.savez_compressed(output, codes=codes, knot_types=np.array(knot_types, dtype=str),
+                            frames=np.arange(0, len(lx), stride), params=np.array(json.dumps(params)))
+    return codes, knot_types
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Calculate the knot type of every frame of the trajectory.')
+    parser.add_argument('file', type=str, help='Path to the structure file in accepted format: .pdb, .xyz or .xtc,'
+                                               ' or to the frame store (.npy).')
+    parser.add_argument('-s', '--stride', type=int, default=1,
+                        help='Calculate every stride-th frame. Only the timeline of every frame (stride 1) can be used'
+                             ' by the analysis.')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of processes.')
+    parser.add_argument('-o', '--top_file', type=str, default=None,
+                        help='Path to a PDB file, a trajectory, or a topology to supply information for non-PDB formats'
+                             ' of the main file.')
+    parser.add_argument('-c', '--closure', type=int, default=1,
+                        help='The method to close the chain. Viable options are parameters of the Closure class (in'
+                             ' topoly.params).')
+    parser.add_argument('-t', '--tries', type=int, default=20, help='Number of tries for stochastic closure methods.')
+    parser.add_argument('-m', '--max_cross', type=int, default=15, help='Maximal number of crossings after reduction '
+                                                                        'to start polynomial calculation.')
+    parser.add_argument('--store', nargs='?', const=True, default=None,
+                        help='Keep the calculated knot types in the persistent SQLite store (shared with the analysis).'
+                             ' Optionally the path to the store, by default the file next to the trajectory.')
+    parser.add_argument('--lazy', action='store_true', help='Decode the frames in chunks, only when they are needed.')
+    parser.add_argument('--knot_engine', choices=['topoly', 'numpy'], default='topoly',
+                        help='Calculate the knot types by topoly or by the built-in NumPy engine (closure 1 only).')
+    parser.add_argument('-r', '--output', type=str, default=None, help='The .npz file with the timeline.')
+
+    args = parser.parse_args()
+    timeline = knot_timeline(args.file, args.stride, args.workers, args.top_file, args.closure, args.tries,
+                             args.max_cross, store=args.store, lazy=args.lazy, knot_engine=args.knot_engine,
+                             output=args.output)
+    if timeline is not None:
+        codes, knot_types = timeline
+        counts = np.bincount(codes, minlength=256)
+        for code in np.nonzero(counts)[0]:
+            name = knot_types[code] if code < len(knot_types) else 'unknown'
+            print(f"{name}: {counts[code]} frames ({100 * counts[code] / len(codes):.1f}%)")
@@ -0,0 +1,85 @@
+import os
+import pickle
+import tempfile
+import time
+
+
+class Checkpoint:
+    """
+    State file of the analysis, which allows to resume the interrupted analysis of a long trajectory. The analysis
+    saves the outputs of its completed stages (frame_list, untied_list, knot_dict), the knot core ranges of the
+    processed knotting frames and the knot core samples of the plot. The file is replaced atomically, so it is
+    never left half-written, if the process is killed. The state is written after every stage, the progress inside
+    the stages is written at most once per interval, because the whole state is rewritten every time.
+
+    The state is saved together with the parameters of the analysis. The state saved with different parameters, or
+    a file, which is not a checkpoint, can not be resumed (ValueError).
+
+    Args:
+        path (str):
+                The path to the state file.
+        resume (bool, optional):
+                If True, the state saved in the file is loaded, otherwise the analysis starts from the beginning and
+                the file is overwritten.
+                Default: False.
+        interval (float, optional):
+                The minimum time (in seconds) between the writes of the progress inside the stages.
+                Default: 60.
+    """
+    def __init__(self, path, resume=False, interval=60):
+        self.path = path
+        self.resume = resume
+        self.interval = interval
+        # time of the last write of the state
+        self.saved = None
+
+    @staticmethod
+    def sidecar_path(file):
+        """
+        Returns: the default path of the state file for the given trajectory file.
+        """
+        return file + ".checkpoint.pkl"
+
+    def load(self, params):
+        """
+        Returns: the saved state (dictionary) or None, if there is nothing to resume.
+        """
+        if not self.resume or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as state_file:
+                saved_params, state = pickle.load(state_file)
+        except (pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+            raise ValueError(f"The file {self.path} is not a checkpoint of the analysis, it can not be resumed.")
+        if saved_params != params:
+            raise ValueError(f"The checkpoint {self.path} was saved with different parameters of the analysis, it can "
+                             f"not be resumed.")
+        return state
+
+    def save(self, params, state, force=True):
+        """
+        Function saves the state with the parameters of the analysis. Unless force is True, the state is not written,
+        if it was written less than interval seconds ago.
+
+        Returns: True if the state was written.
+        """
+        if not force and self.saved is not None and time.monotonic() - self.saved < self.interval:
+            return False
+        directory = os.path.dirname(os.path.abspath(self.path))
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as state_file:
+                pickle.dump((params, state), state_file)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.saved = time.monotonic()
+        return True
+
+    def remove(self):
+        """
+        Function removes the state file, when the analysis is finished.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
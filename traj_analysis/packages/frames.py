@@ -0,0 +1,310 @@
+from collections import OrderedDict
+import os
+import tempfile
+import mdtraj as md
+import numpy as np
+from packages.knotcore import check_file_extension, load_frame_index, read_pdb_frames
+
+
+def is_ca_pdb(file):
+    """
+    Function checks if the PDB file has the layout of the coarse-grained trajectories: only CA atoms in every model.
+    Only the first model is examined.
+
+    Returns: True if all atoms of the first model are CA atoms, False otherwise.
+    """
+    if check_file_extension(file) != ".pdb":
+        return False
+    n_atoms = 0
+    with open(file, "rb") as pdb:
+        for line in pdb:
+            if line.startswith((b"ATOM", b"HETATM")):
+                if line[12:16].strip() != b"CA":
+                    return False
+                n_atoms += 1
+            elif line.startswith(b"END") and n_atoms > 0:
+                break
+    return n_atoms > 0
+
+
+def parse_pdb_coordinates(atom_lines, n_atoms):
+    """
+    Function parses the fixed-column coordinates of the ATOM/HETATM lines of the consecutive models at once.
+
+    Returns:
+        Array of shape (frames, atoms, 3), in nanometers like in md.Trajectory.xyz.
+    """
+    if len(atom_lines) % n_atoms != 0:
+        raise ValueError("The models of the PDB file have different numbers of atoms.")
+    xyz = np.empty((len(atom_lines) // n_atoms, n_atoms, 3), dtype=np.float32)
+    columns = np.array([(line[30:38], line[38:46], line[46:54]) for line in atom_lines], dtype="S8")
+    # PDB coordinates are in angstroms, they are converted in double precision like by mdtraj
+    xyz.reshape(-1, 3)[:] = columns.astype(np.float64) * 0.1
+    return xyz
+
+
+def read_ca_pdb(file):
+    """
+    Fast reader of the CA-only multi-model PDB trajectories (see is_ca_pdb). Instead of building the full topology in
+    the general PDB parser, the coordinates of all frames are parsed in bulk.
+
+    Returns:
+        Array of shape (frames, atoms, 3), in nanometers - the same coordinates as md.load_pdb(file).xyz.
+    """
+    with open(file, "rb") as pdb:
+        lines = pdb.read().splitlines()
+    atom_lines = []
+    n_atoms = 0
+    for line in lines:
+        if line.startswith((b"ATOM", b"HETATM")):
+            atom_lines.append(line)
+        elif line.startswith(b"END") and n_atoms == 0:
+            n_atoms = len(atom_lines)
+    return parse_pdb_coordinates(atom_lines, n_atoms if n_atoms > 0 else len(atom_lines))
+
+
+def iter_pdb(file, chunk_size=1000):
+    """
+    Streaming reader of the multi-model PDB trajectories for the files larger than memory (mdtraj.iterload reads the
+    whole PDB file at once). The file is read line by line and the coordinates of chunk_size models are parsed in
+    bulk. Like in mdtraj, only the first of the alternate locations of every atom is read.
+
+    Yields:
+        Arrays of shape (frames, atoms, 3) with chunk_size consecutive frames (the last one may be shorter), the same
+        coordinates as md.load_pdb(file).xyz.
+    """
+    atom_lines = []
+    frames = 0
+    n_atoms = 0
+    locations = set()
+    with open(file, "rb") as pdb:
+        for line in pdb:
+            if line.startswith((b"ATOM", b"HETATM")):
+                if line[16:17].strip():
+                    # atom name, residue and chain of the atom with the alternate locations
+                    atom = line[12:16] + line[17:27]
+                    if atom in locations:
+                        continue
+                    locations.add(atom)
+                atom_lines.append(line)
+            elif line.startswith(b"END") and len(atom_lines) > frames * n_atoms:
+                if n_atoms == 0:
+                    n_atoms = len(atom_lines)
+                frames += 1
+                locations.clear()
+                if frames == chunk_size:
+                    yield parse_pdb_coordinates(atom_lines, n_atoms)
+                    atom_lines = []
+                    frames = 0
+    if len(atom_lines) > 0:
+        yield parse_pdb_coordinates(atom_lines, n_atoms if n_atoms > 0 else len(atom_lines))
+
+
+class LazyFrames:
+    """
+    Lazy provider of the frames of the trajectory, which can be used instead of the list of the frames (t.xyz) in the
+    analysis. The frames are decoded from the file in chunks only when the analysis needs them, and only a limited
+    number of the recently used chunks is kept in memory, so trajectories larger than the memory can be analyzed.
+
+    XTC files are read with the seek of the XTC reader. PDB files are streamed with iter_pdb, the other formats with
+    mdtraj.iterload, both have to decode the file from the beginning, when an earlier chunk is needed again. With the
+    frame index (see build_frame_index), the PDB files are also read from the offset of the needed chunk, and the XTC
+    offsets are not calculated again.
+
+    Args:
+        file (str):
+                The path to the structure in accepted format: .pdb, .xyz or .xtc.
+        top_file (str):
+                The topology for the non-PDB formats (see load_structure).
+        chunk_size (int, optional):
+                The number of frames decoded at once.
+                Default: 1000.
+        max_chunks (int, optional):
+                The maximum number of decoded chunks kept in memory.
+                Default: 8.
+        frame_index (bool, optional):
+                If True, the frame index (.pdb and .xtc files) is read from the sidecar file, or built and saved
+                there, if it does not exist yet.
+                Default: False.
+    """
+    def __init__(self, file, top_file=None, chunk_size=1000, max_chunks=8, frame_index=False):
+        if check_file_extension(file) != ".pdb" and top_file is None:
+            raise ValueError("This format of file requires an additional file 'top_file'.")
+        self.file = file
+        self.top_file = top_file
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.loaded_chunks = 0
+        # number of the frames decoded from the file, the frames of the chunks read again are counted again
+        self.loaded_frames = 0
+        self._chunks = OrderedDict()
+        self._xtc = None
+        self._iterator = None
+        self._next_chunk = 0
+        self.offsets = None
+        if frame_index and check_file_extension(file) in (".pdb", ".xtc"):
+            self.offsets = load_frame_index(file)
+
+        if check_file_extension(file) == ".xtc":
+            self._xtc = md.formats.XTCTrajectoryFile(file)
+            if self.offsets is not None:
+                self._xtc.offsets = self.offsets
+            self.n_frames = len(self._xtc)
+            self.n_atoms = self._chunk(0).shape[1]
+        elif self.offsets is not None:
+            self.n_frames = len(self.offsets)
+            self.n_atoms = self._chunk(0).shape[1]
+        else:
+            # the number of frames is not stored in the file, so it is counted by decoding it once
+            self.n_frames = 0
+            for xyz in self._iterate():
+                self.n_frames += xyz.shape[0]
+                self.n_atoms = xyz.shape[1]
+
+    def __len__(self):
+        return self.n_frames
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.n_frames
+        if not 0 <= i < self.n_frames:
+            raise IndexError("Frame index out of range.")
+        return self._chunk(i // self.chunk_size)[i % self.chunk_size]
+
+    def _chunk(self, k):
+        """
+        Returns: the decoded chunk number k, as an array of shape (frames, atoms, 3).
+        """
+        if k in self._chunks:
+            self._chunks.move_to_end(k)
+            return self._chunks[k]
+
+        if self._xtc is not None:
+            self._xtc.seek(k * self.chunk_size)
+            xyz = self._xtc.read(self.chunk_size)[0]
+        elif self.offsets is not None:
+            xyz = read_pdb_frames(self.file, self.offsets, k * self.chunk_size, self.chunk_size)
+        else:
+            if self._iterator is None or self._next_chunk > k:
+                self._iterator = self._iterate()
+                self._next_chunk = 0
+            while self._next_chunk <= k:
+                xyz = next(self._iterator)
+                self._next_chunk += 1
+        self.loaded_chunks += 1
+        self.loaded_frames += xyz.shape[0]
+
+        self._chunks[k] = xyz
+        while len(self._chunks) > self.max_chunks:
+            self._chunks.popitem(last=False)
+        return xyz
+
+    def _iterate(self):
+        """
+        Yields: the consecutive chunks of the trajectory, decoded from the beginning of the file.
+        """
+        if check_file_extension(self.file) == ".pdb":
+            yield from iter_pdb(self.file, self.chunk_size)
+        else:
+            for chunk in md.iterload(self.file, top=self.top_file, chunk=self.chunk_size):
+                yield chunk.xyz
+
+    def close(self):
+        if self._xtc is not None:
+            self._xtc.close()
+
+
+def convert_structure(file, top_file=None, output=None, selection=None, chunk_size=1000):
+    """
+    Function converts the trajectory into the binary frame store: a .npy file with the float32 array of shape
+    (frames, atoms, 3) (the coordinates in nanometers, like in md.Trajectory.xyz). The trajectory is read in chunks,
+    so it does not need to fit in memory. The store is opened by open_frame_store as a memory-mapped array, which
+    makes the start of the analysis almost instant, the frames are read from the disk only when they are used and the
+    pages are shared by all processes reading the same file. PDB files are streamed with iter_pdb, the other formats
+    with mdtraj.iterload.
+
+    Args:
+        file (str):
+                The path to the structure in accepted format: .pdb, .xyz or .xtc.
+        top_file (str, optional):
+                The topology for the non-PDB formats (see load_structure).
+        output (str, optional):
+                The path to the frame store.
+                Default: None, the trajectory path with the .npy extension.
+        selection (str, optional):
+                mdtraj atom selection (e.g. 'name CA') of the atoms, which are written to the store.
+                Default: None, all atoms.
+        chunk_size (int, optional):
+                The number of frames read at once.
+                Default: 1000.
+
+    Returns:
+        The path to the frame store.
+    """
+    extension = check_file_extension(file)
+    if extension != ".pdb" and top_file is None:
+        raise ValueError("This format of file requires an additional file 'top_file'.")
+    if output is None:
+        output = os.path.splitext(file)[0] + ".npy"
+
+    topology = load_pdb_topology(file) if extension == ".pdb" else md.load_topology(top_file)
+    atom_indices = topology.select(selection) if selection is not None else None
+    n_atoms = len(atom_indices) if atom_indices is not None else topology.n_atoms
+
+    if extension == ".xtc":
+        with md.formats.XTCTrajectoryFile(file) as xtc:
+            n_frames = len(xtc)
+    elif extension == ".pdb":
+        n_frames = len(load_frame_index(file))
+    else:
+        n_frames = sum(chunk.n_frames for chunk in md.iterload(file, top=top_file, chunk=chunk_size))
+
+    if extension == ".pdb":
+        chunks = (xyz[:, atom_indices] if atom_indices is not None else xyz for xyz in iter_pdb(file, chunk_size))
+    else:
+        chunks = (chunk.xyz for chunk in md.iterload(file, top=top_file, chunk=chunk_size, atom_indices=atom_indices))
+
+    store = np.lib.format.open_memmap(output, mode="w+", dtype=np.float32, shape=(n_frames, n_atoms, 3))
+    start = 0
+    for xyz in chunks:
+        store[start:start + xyz.shape[0]] = xyz
+        start += xyz.shape[0]
+    store.flush()
+    del store
+
+    return output
+
+
+def load_pdb_topology(file):
+    """
+    Function loads the topology of the PDB trajectory from its first model only, md.load_topology would parse all
+    models of the file.
+
+    Returns: md.Topology of the first model.
+    """
+    descriptor, first_model = tempfile.mkstemp(suffix=".pdb")
+    try:
+        with open(file, "rb") as pdb, os.fdopen(descriptor, "wb") as model:
+            atoms = False
+            for line in pdb:
+                model.write(line)
+                atoms = atoms or line.startswith((b"ATOM", b"HETATM"))
+                if atoms and line.startswith(b"END"):
+                    break
+        return md.load_topology(first_model)
+    finally:
+        os.remove(first_model)
+
+
+def open_frame_store(file):
+    """
+    Function opens the frame store written by convert_structure. The frames are not read into memory, they are
+    paged in by the operating system when they are used.
+
+    Returns:
+        Memory-mapped array of shape (frames, atoms, 3), which can be used as the list of frames in the analysis.
+    """
+    frames = np.load(file, mmap_mode="r")
+    if frames.ndim != 3 or frames.shape[2] != 3:
+        raise ValueError("The file is not a frame store, expected an array of shape (frames, atoms, 3).")
+    return frames
@@ -0,0 +1,174 @@
+import numpy as np
+
+
+def close_chains(chains):
+    """
+    Function closes the open chains in the same way as the deterministic closure of topoly (Closure.MASS_CENTER):
+    both ends are extended outward, along the lines from the center of mass through the ends, far outside the chain
+    and connected there. All chains are closed at once.
+
+    Args:
+        chains (array-like):
+                Coordinates of the chains, shape (frames, atoms, 3).
+
+    Returns:
+        Tuple (polygons, ambiguous). The polygons have shape (frames, atoms + 3, 3), the last vertex of every
+        polygon is connected to the first one. ambiguous is True for the chains, whose ends point in nearly opposite
+        directions, so that the connection outside the chain is not well defined.
+    """
+    chains = np.asarray(chains, dtype=np.float64)
+    centers = chains.mean(axis=1, keepdims=True)
+    radius = np.linalg.norm(chains - centers, axis=2).max(axis=1)
+    ends = chains[:, [0, -1]] - centers
+    lengths = np.linalg.norm(ends, axis=2, keepdims=True)
+    directions = ends / np.where(lengths > 0, lengths, 1)
+    ambiguous = (radius == 0) | (lengths[:, :, 0] == 0).any(axis=1) | \
+        (np.einsum('ij,ij->i', directions[:, 0], directions[:, 1]) < -0.9)
+
+    middle = directions[:, 0] + directions[:, 1]
+    # for the opposite ends, any direction perpendicular to them is good
+    perpendicular = np.cross(directions[:, 0], np.eye(3)[np.argmin(np.abs(directions[:, 0]), axis=1)])
+    middle = np.where(np.linalg.norm(middle, axis=1, keepdims=True) > 0.1, middle, perpendicular)
+    middle /= np.linalg.norm(middle, axis=1, keepdims=True)
+
+    far = 10 * np.maximum(radius, 1e-9)[:, None, None]
+    closing = centers + far * np.stack([directions[:, 1], 2 * middle, directions[:, 0]], axis=1)
+    return np.concatenate([chains, closing], axis=1), ambiguous
+
+
+def mass_center_closure(chain):
+    """
+    Function closes one open chain like close_chains.
+
+    Args:
+        chain (array-like):
+                Coordinates of the chain, shape (atoms, 3).
+
+    Returns:
+        The closed polygon as an array of vertices (the last vertex is connected to the first one), or None if the
+        ends point in nearly opposite directions, so that the connection outside the chain is not well defined.
+    """
+    polygons, ambiguous = close_chains(np.asarray(chain)[None])
+    return None if ambiguous[0] else polygons[0]
+
+
+def edges_cross_triangle(a, b, c, starts, ends):
+    """
+    Function checks which of the given edges can intersect the triangle (a, b, c). The test is conservative: edges
+    touching the triangle or lying (almost) in its plane count as intersecting. The vertices a, b, c can also be the
+    arrays of vertices of several triangles, then every triangle is checked against all edges.
+
+    Returns: boolean array, True for every edge, which may intersect the triangle (one row for every triangle).
+    """
+    eps = 1e-9
+    a, b, c = (np.asarray(vertex)[..., None, :] for vertex in (a, b, c))
+    edge1 = b - a
+    edge2 = c - a
+    normal = np.cross(edge1, edge2)
+    scale = np.linalg.norm(normal, axis=-1)
+    direction = ends - starts
+    h = np.cross(direction, edge2)
+    det = np.sum(h * edge1, axis=-1)
+    parallel = np.abs(det) < eps * scale * np.maximum(np.linalg.norm(direction, axis=-1), eps)
+    det = np.where(parallel, 1.0, det)
+
+    s = starts - a
+    u = np.sum(s * h, axis=-1) / det
+    q = np.cross(s, edge1)
+    v = np.sum(direction * q, axis=-1) / det
+    t = np.sum(q * edge2, axis=-1) / det
+    crossing = (u > -eps) & (v > -eps) & (u + v < 1 + eps) & (t > -eps) & (t < 1 + eps)
+
+    # edges parallel to the plane of the triangle block it, when they lie close to the plane
+    in_plane = np.abs(np.sum(s * normal, axis=-1)) < eps * scale * np.maximum(np.linalg.norm(edge1, axis=-1), 1)
+    return np.where(parallel, in_plane, crossing)
+
+
+def in_triangle_plane(points, a, b, c):
+    """
+    Returns: boolean array, True for every point (one for every triangle), which lies (almost) in the plane of its
+             triangle (a, b, c).
+    """
+    normal = np.cross(b - a, c - a)
+    scale = np.linalg.norm(normal, axis=-1) * np.maximum(np.linalg.norm(c - a, axis=-1), 1)
+    return np.abs(np.einsum('ij,ij->i', points - a, normal)) < 1e-9 * scale
+
+
+def reduce_polygon(polygon, stop=5):
+    """
+    Function reduces the closed polygon by the triangle elimination (KMT algorithm): the vertex is removed, if the
+    triangle formed by it and its neighbours is not intersected by any other edge of the polygon. Such a move does
+    not change the knot type. The reduction ends, when no vertex can be removed or when only stop vertices are left.
+
+    In every pass the triangles of all vertices are checked against all edges at once. The free vertices are then
+    removed one after another, each only if its triangle is not crossed by the edges created by the removals before
+    it in the pass, so the reduction is still a sequence of valid moves.
+
+    Returns:
+        The reduced polygon.
+    """
+    polygon = np.asarray(polygon, dtype=np.float64)
+    while len(polygon) > stop:
+        m = len(polygon)
+        index = np.arange(m)
+        # the triangle of the vertex i is (i - 1, i, i + 1), the edge j goes from the vertex j to the vertex j + 1
+        previous, following = polygon[index - 1], polygon[(index + 1) % m]
+        blocked = edges_cross_triangle(previous, polygon, following, polygon, following)
+        # the edges i - 1 and i are the sides of the triangle, the adjacent edges i - 2 and i + 1 touch it in the
+        # common vertex and only block it, if their other vertex lies in its plane
+        blocked[index, index - 1] = False
+        blocked[index, index] = False
+        blocked[index, (index + 1) % m] = in_triangle_plane(polygon[(index + 2) % m], previous, polygon, following)
+        blocked[index, index - 2] = in_triangle_plane(polygon[index - 2], previous, polygon, following)
+        degenerate = ~np.cross(polygon - previous, following - previous).any(axis=1)
+        candidates = np.flatnonzero(~blocked.any(axis=1) & ~degenerate)
+        if len(candidates) == 0:
+            break
+
+        # the removal of the vertex j replaces its sides by the edge (j - 1, j + 1), which touches the triangles of
+        # the vertices j - 2 and j + 2 in the common vertex
+        crossed = edges_cross_triangle(previous[candidates], polygon[candidates], following[candidates],
+                                       previous[candidates], following[candidates])
+        touching_before = in_triangle_plane(polygon[candidates - 3], previous[candidates], polygon[candidates],
+                                            following[candidates])
+        touching_after = in_triangle_plane(polygon[(candidates + 3) % m], previous[candidates], polygon[candidates],
+                                           following[candidates])
+        removed = []
+        for k, vertex in enumerate(candidates):
+            if m - len(removed) <= stop:
+                break
+            conflict = False
+            for j in removed:
+                distance = (vertex - candidates[j]) % m
+                if distance in (1, m - 1):
+                    conflict = True
+                elif distance == 2:
+                    conflict = touching_before[k]
+                elif distance == m - 2:
+                    conflict = touching_after[k]
+                else:
+                    conflict = crossed[k, j]
+                if conflict:
+                    break
+            if not conflict:
+                removed.append(k)
+        polygon = np.delete(polygon, candidates[removed], axis=0)
+    return polygon
+
+
+def unknot_certified(chain, closure):
+    """
+    Cheap certificate of the unknot. The chain is closed like by topoly and reduced by the triangle elimination. If at
+    most 5 vertices are left, the closed chain is unknotted (at least 6 edges are needed to form a knot), so the
+    Alexander polynomial does not need to be calculated.
+
+    Only the deterministic closure (closure == 1) can be certified.
+
+    Returns: True if the chain is certainly unknotted, False if the certificate can not decide it.
+    """
+    if closure != 1 or len(chain) < 4:
+        return False
+    polygon = mass_center_closure(chain)
+    if polygon is None:
+        return False
+    return len(reduce_polygon(polygon, stop=5)) <= 5
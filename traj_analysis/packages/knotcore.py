@@ -1,7 +1,89 @@
 from topoly import alexander
 import mdtraj as md
+import numpy as np
 from Bio.PDB import PDBParser, PDBExceptions
 import os
+from packages import profiler
+
+
+def call_alexander(*args, **kwargs):
+    """
+    Function calls the alexander function of topoly, the call is counted and timed by the active profiler (together
+    with the number of the random closures of the structures).
+    """
+    if kwargs.get("closure", 1) != 1:
+        profiler.count("random closures", kwargs.get("tries", 20) * len(kwargs.get("chain_boundary") or [None]))
+    with profiler.timed("alexander"):
+        return alexander(*args, **kwargs)
+
+
+def adaptive_alexander(chain, closure, tries, max_cross, cutoffs=(), chain_boundary=None, batch=5, confidence=0.05):
+    """
+    Function calculates the probabilities of the knot types of the structure with the random closures, like the
+    alexander function of topoly with the given tries, but the closures are run in batches. The calculation stops,
+    when the decision made from the probabilities is settled: by the Hoeffding bound, the probability estimated from
+    n closures differs from the true one by more than sqrt(ln(2 / confidence) / (2n)) with the probability lower than
+    confidence. The decision is settled, when the leading knot type is separated from the runner-up (their
+    intervals do not overlap) and the interval of the leading knot type does not contain any of the cutoffs.
+    Otherwise all tries closures are run. The first batch has the smallest number of closures, after which the
+    calculation can stop.
+
+    Args:
+        chain (list):
+                Coordinates of the structure.
+        closure (int):
+                The random closure method (greater than 1).
+        tries (int):
+                The maximum number of the closures.
+        max_cross (int):
+                The maximal number of crossings after reduction to start the polynomial calculation.
+        cutoffs (tuple of float, optional):
+                The thresholds of the probability of the leading knot type, against which the decisions are made.
+                Default: (), only the leading knot type is decided.
+        chain_boundary (list of lists of (int, int), optional):
+                The sub-chains, which are calculated at once (see topoly), each one stops separately.
+                Default: None, the whole chain.
+        batch (int, optional):
+                The number of the closures run at once after the first batch.
+                Default: 5.
+        confidence (float, optional):
+                The accepted probability of the wrong decision.
+                Default: 0.05.
+
+    Returns:
+        Dictionary {knot type: probability}, the probability is the fraction of the closures giving the knot type, as
+        in topoly. If the chain_boundary is given, the dictionary of such dictionaries with the boundaries as keys.
+    """
+    boundaries = [None] if chain_boundary is None else [tuple(boundary) for boundary in chain_boundary]
+    counts = {boundary: {} for boundary in boundaries}
+
+    def settled(boundary, done):
+        bound = np.sqrt(np.log(2 / confidence) / (2 * done))
+        leader, runner_up = (sorted(counts[boundary].values(), reverse=True) + [0, 0])[:2]
+        leader, runner_up = leader / done, runner_up / done
+        return leader - runner_up > 2 * bound and all(abs(leader - cutoff) > bound for cutoff in cutoffs)
+
+    done = 0
+    # no decision is settled with less than 2 ln(2 / confidence) closures (the bound is at least 1/2)
+    n = max(batch, int(2 * np.log(2 / confidence)) + 1)
+    pending = boundaries
+    while len(pending) > 0:
+        n = min(n, tries - done)
+        if chain_boundary is None:
+            res = {None: call_alexander(chain, closure=closure, tries=n, max_cross=max_cross, run_parallel=False)}
+        else:
+            res = call_alexander(chain, chain_boundary=[list(boundary) for boundary in pending], closure=closure,
+                                 tries=n, max_cross=max_cross, run_parallel=False)
+        for boundary in pending:
+            for kn, prob in res[boundary].items():
+                counts[boundary][kn] = counts[boundary].get(kn, 0) + prob * n
+        done += n
+        n = batch
+        pending = [boundary for boundary in pending if done < tries and not settled(boundary, done)]
+
+    probabilities = {boundary: {kn: count / done for kn, count in counts[boundary].items()}
+                     for boundary in boundaries}
+    return probabilities[None] if chain_boundary is None else probabilities
 
 
 def check_file_extension(filename):
@@ -54,24 +136,12 @@ def process_structure_and_calculate(file, chain_id, atom_list, closure, tries, m
                                 if atom.name in atom_list:
                                     chain_atoms.append(atom)
 
-        with open("output.nxyz", "w") as f:
-            i = 0
-            for atom in chain_atoms:
-                coords = atom.get_coord()
-                x, y, z = coords[0], coords[1], coords[2]
-
-                f.write("{} {} {} {}\n".format(i, x, y, z))
-                i += 1
-        f.close()
-        output_file = "output.nxyz"
-        pdb = True
+        # coordinates are passed to topoly directly, the atoms are numbered from 0
+        chain = [atom.get_coord() for atom in chain_atoms]
     else:
-        output_file = file
-        pdb = False
+        chain = file
 
-    knotcore_result = count_knotcore(output_file, closure=closure, tries=tries, max_cross=max_cross)
-    if pdb:
-        os.remove("output.nxyz")
+    knotcore_result = count_knotcore(chain, closure=closure, tries=tries, max_cross=max_cross)
 
     return knotcore_result
 
@@ -109,6 +179,95 @@ def load_structure(file, top_file):
     return t
 
 
+def frame_index_path(file):
+    """
+    Returns: the default path of the frame index of the given trajectory file.
+    """
+    return file + ".frameidx.npy"
+
+
+def build_frame_index(file, index_file=None):
+    """
+    Function builds the index of the trajectory, i.e. the byte offsets of the beginnings of all frames in the file,
+    and saves it as the .npy sidecar file. Thanks to it, any chunk of frames can be read with one seek (see LazyFrames).
+    For the PDB files, the frames are the models separated by MODEL/ENDMDL or END records. For the XTC files, the
+    offsets calculated by the XTC reader are saved.
+
+    Args:
+        file (str):
+                The path to the trajectory in .pdb or .xtc format.
+        index_file (str, optional):
+                The path to the index file.
+                Default: None, the file next to the trajectory ('<file>.frameidx.npy').
+
+    Returns:
+        Array of the offsets of the frames.
+    """
+    extension = check_file_extension(file)
+    if extension == ".xtc":
+        with md.formats.XTCTrajectoryFile(file) as xtc:
+            offsets = np.asarray(xtc.offsets, dtype=np.int64)
+    elif extension == ".pdb":
+        offsets = []
+        in_frame = False
+        position = 0
+        with open(file, "rb") as pdb:
+            for line in pdb:
+                if not in_frame and line.startswith((b"MODEL", b"ATOM", b"HETATM")):
+                    offsets.append(position)
+                    in_frame = True
+                elif line.startswith(b"END"):
+                    in_frame = False
+                position += len(line)
+        offsets = np.asarray(offsets, dtype=np.int64)
+    else:
+        raise ValueError("The frame index can be built only for .pdb and .xtc files.")
+
+    np.save(index_file if index_file is not None else frame_index_path(file), offsets)
+    return offsets
+
+
+def load_frame_index(file, index_file=None):
+    """
+    Function reads the index of the trajectory from the sidecar file. The index is built (again), if it does not
+    exist or is older than the trajectory.
+
+    Returns:
+        Array of the offsets of the frames.
+    """
+    if index_file is None:
+        index_file = frame_index_path(file)
+    if os.path.exists(index_file) and os.path.getmtime(index_file) >= os.path.getmtime(file):
+        return np.load(index_file)
+    return build_frame_index(file, index_file)
+
+
+def read_pdb_frames(file, offsets, start, count):
+    """
+    Function reads the coordinates of the atoms (ATOM and HETATM records) of count frames of the PDB trajectory,
+    starting from the frame number start.
+
+    Returns:
+        Array of shape (frames, atoms, 3), in nanometers like in md.Trajectory.xyz.
+    """
+    frames = []
+    with open(file, "rb") as pdb:
+        pdb.seek(offsets[start])
+        coords = []
+        for line in pdb:
+            if line.startswith((b"ATOM", b"HETATM")):
+                coords.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+            elif line.startswith(b"END") and len(coords) > 0:
+                frames.append(coords)
+                coords = []
+                if len(frames) == count:
+                    break
+        if len(coords) > 0:
+            frames.append(coords)
+    # PDB coordinates are in angstroms, they are converted in double precision like by mdtraj
+    return (np.array(frames, dtype=np.float64) * 0.1).astype(np.float32)
+
+
 def get_lider_from_dict(knot_dict):
     kn, pr = '0_1', 0
     for (k, p) in knot_dict.items():
@@ -117,7 +276,8 @@ def get_lider_from_dict(knot_dict):
     return [kn, pr]
 
 
-def find_knotcore_simple(chain, gap=1, closure=1, tries=20, cutoff=0.42, max_cross=15):
+def find_knotcore_simple(chain, gap=1, closure=1, tries=20, cutoff=0.42, max_cross=15, search='linear', hint=None,
+                         batch_size=8, adaptive=False):
     """
     This function is a slightly modified version of the code from original function authored by Dr Wanda Niemyska.
     The function is used with the author's permission. In the future, there are plans to include the knot core value
@@ -133,11 +293,14 @@ def find_knotcore_simple(chain, gap=1, closure=1, tries=20, cutoff=0.42, max_cro
            respectively, there is a main_knot formed - if yes, returns this as a knotcore, if not decreases cut_beg
            and cut_end by one, and tries again;
 
-    It is possible to specify indexes of first and last atoms for .xyz and .nxyz files.
+    It is possible to specify indexes of first and last atoms for .xyz and .nxyz files. The structure can be also
+    given directly as the coordinates (e.g. NumPy array of shape (n_atoms, 3)), then it is passed to topoly without
+    any file and the atoms are numbered from 0.
 
     Args:
-        chain (str):
-                Structure for which the knot core value is to be calculated, in the .xyz or .nxyz format.
+        chain (str or array-like):
+                Structure for which the knot core value is to be calculated, in the .xyz or .nxyz format, or its
+                coordinates.
         gap (int, optional):
                 The maximum number of frames in which there is no knot, or for some reason, the knot core value cannot
                 be calculated, for which the computations will not be interrupted (i.e., the interruption will not be
@@ -147,6 +310,29 @@ def find_knotcore_simple(chain, gap=1, closure=1, tries=20, cutoff=0.42, max_cro
                 The parameter used during the application of random closures. It determines the threshold above which
                 we consider that a knot has formed.
                 Default: 0.42.
+        search (str, optional):
+                How the number of atoms, which can be cut from the ends, is searched in the step 2.
+                'linear': atoms are cut one by one (the reference method).
+                'gallop': the boundary is bracketed with exponentially growing steps and found by bisection, then
+                verified within the gap, which needs about log(N) instead of N polynomial calculations.
+                'batch': the same cuts as in 'linear', but the next batch_size candidate sub-chains are passed to
+                topoly in one call (one chain_boundary list), which amortises the setup of the call, and every
+                sub-chain is calculated only once in the whole function (the results are memoized).
+                Default: 'linear'.
+        hint (tuple of (int, int), optional):
+                The knot core range found in a similar structure (e.g. the previous frame of the trajectory). Then
+                the step 2 starts from the hint boundaries instead of the whole chain: it searches outward (at most
+                10 atoms) until the shortened chain forms main_knot and then inward as usual. If main_knot is not
+                found near the hint boundary, this end of the chain is searched from the beginning.
+                Default: None.
+        batch_size (int, optional):
+                The number of the candidate sub-chains calculated in one call of topoly in the 'batch' search.
+                Default: 8.
+        adaptive (bool, optional):
+                If True, the random closures (closure other than 1) are run in small batches until the leading knot
+                type and its probability against the cutoff (and 0.8 * cutoff) are settled (see adaptive_alexander),
+                at most tries closures.
+                Default: False.
 
     Returns: None or
             (begin_of_knotcore, end_of_knotcore), where these are ids from the file (not necessarily
@@ -154,10 +340,32 @@ def find_knotcore_simple(chain, gap=1, closure=1, tries=20, cutoff=0.42, max_cro
     """
     id_beg = 0
     id_end = 0
+    memo = {}
+    # the thresholds of the probability of the knot type, at which the decisions are made (the knot core is shrunk
+    # until the probability reaches 0.8 * cutoff)
+    cutoffs = (cutoff, 0.8 * cutoff)
+
+    def find_subknots(boundaries):
+        # the sub-chains, which were not calculated yet, are passed to topoly at once
+        missing = [boundary for boundary in dict.fromkeys(boundaries) if boundary not in memo]
+        if len(missing) > 0:
+            if adaptive and closure > 1:
+                res = adaptive_alexander(chain, closure, tries, max_cross, cutoffs, missing)
+            else:
+                res = call_alexander(chain, chain_boundary=[list(boundary) for boundary in missing], closure=closure,
+                                     tries=tries, max_cross=max_cross, run_parallel=False)
+            for boundary in missing:
+                memo[boundary] = get_lider_from_dict(res[boundary]) if closure > 1 else (res[boundary], 1)
 
     def find_subknot(beg, end):
-        kn = alexander(chain, chain_boundary=[[beg, end]], closure=closure, tries=tries, max_cross=max_cross,
-                       run_parallel=False)
+        if search == 'batch':
+            find_subknots([(beg, end)])
+            return memo[(beg, end)]
+        if adaptive and closure > 1:
+            kn = adaptive_alexander(chain, closure, tries, max_cross, cutoffs, [[beg, end]])
+        else:
+            kn = call_alexander(chain, chain_boundary=[[beg, end]], closure=closure, tries=tries, max_cross=max_cross,
+                                run_parallel=False)
         kn = kn[(beg, end)]
         if closure > 1:
             kn, prob = get_lider_from_dict(kn)
@@ -165,14 +373,17 @@ def find_knotcore_simple(chain, gap=1, closure=1, tries=20, cutoff=0.42, max_cro
             prob = 1
         return kn, prob
 
-    if chain.endswith('.nxyz'):
+    if not isinstance(chain, str):
+        chain = [[x, y, z] for x, y, z in chain]
+        id_beg, id_end = 0, len(chain) - 1
+    elif chain.endswith('.nxyz'):
         res = []
         with open(chain) as file_nxyz:
             for line in file_nxyz:
                 line_res = line.split()[0]
                 res.append(line_res)
         id_beg, id_end = int(res[0]), int(res[-1])
-    if chain.endswith('.xyz'):
+    elif chain.endswith('.xyz'):
         id_beg = 0
         res = []
         with open(chain) as file_xyz:
@@ -184,24 +395,86 @@ def find_knotcore_simple(chain, gap=1, closure=1, tries=20, cutoff=0.42, max_cro
     if main_knot == '0_1' or prob < cutoff:
         return None
 
-    cut_beg = 0
-    act_kn, prob, act_gap = main_knot, 1, 0
-    while id_beg + cut_beg < id_end - 5 and ((act_kn == main_knot and prob >= cutoff) or act_gap <= gap):
-        cut_beg += 1
-        act_kn, prob = find_subknot(id_beg + cut_beg, id_end)
-        if act_kn == main_knot and prob >= cutoff:
-            act_gap = 0
-        else:
-            act_gap += 1
-    cut_end = 0
-    act_kn, prob, act_gap = main_knot, 1, 0
-    while id_beg + 5 < id_end - cut_end and ((act_kn == main_knot and prob >= cutoff) or act_gap <= gap):
-        cut_end += 1
-        act_kn, prob = find_subknot(id_beg, id_end - cut_end)
-        if act_kn == main_knot and prob >= cutoff:
-            act_gap = 0
-        else:
-            act_gap += 1
+    def knotted(beg, end):
+        act_kn, prob = find_subknot(beg, end)
+        return act_kn == main_knot and prob >= cutoff
+
+    def linear_cut(is_knotted, limit, start, boundary=None):
+        # cutting one atom after another, as long as the chain is knotted or the gap is not exceeded; with the
+        # boundary of the cut given, the next batch_size cuts are calculated at once
+        cut, act_knotted, act_gap = start, True, 0
+        while cut < limit and (act_knotted or act_gap <= gap):
+            cut += 1
+            if boundary is not None and boundary(cut) not in memo:
+                find_subknots([boundary(c) for c in range(cut, min(cut + batch_size, limit + 1))])
+            act_knotted = is_knotted(cut)
+            if act_knotted:
+                act_gap = 0
+            else:
+                act_gap += 1
+        return cut
+
+    def gallop_cut(is_knotted, limit, start):
+        # the same result as linear_cut, if the knot disappears only once while cutting the chain: the last knotted
+        # cut is bracketed with the exponentially growing steps and found by bisection, then the next gap + 1 cuts
+        # are verified - if the knot returns in any of them, the search continues from there
+        last = start
+        while True:
+            step, unknotted = 1, limit
+            while last + step < limit:
+                if is_knotted(last + step):
+                    last += step
+                    step *= 2
+                else:
+                    unknotted = last + step
+                    break
+            while unknotted - last > 1:
+                middle = (last + unknotted) // 2
+                if is_knotted(middle):
+                    last = middle
+                else:
+                    unknotted = middle
+            for cut in range(last + 1, min(last + gap + 1, limit) + 1):
+                if is_knotted(cut):
+                    last = cut
+                    break
+            else:
+                return min(last + gap + 1, limit)
+
+    def hinted_start(is_knotted, start):
+        # going outward from the hint boundary until the chain is knotted, but at most hint_range atoms - if the knot
+        # is not found there, the hint is wrong and the whole chain is searched (no cut means the whole, knotted chain)
+        for cut in range(start, max(start - hint_range, 0) - 1, -1):
+            if cut == 0 or is_knotted(cut):
+                return cut
+        return 0
+
+    cut_search = gallop_cut if search == 'gallop' else linear_cut
+    limit = id_end - 5 - id_beg
+
+    def boundary_beg(cut):
+        return id_beg + cut, id_end
+
+    def boundary_end(cut):
+        return id_beg, id_end - cut
+
+    def knotted_beg(cut):
+        return knotted(*boundary_beg(cut))
+
+    def knotted_end(cut):
+        return knotted(*boundary_end(cut))
+
+    start_beg, start_end = 0, 0
+    hint_range = 10
+    if hint is not None and id_beg <= hint[0] < hint[1] <= id_end:
+        start_beg = hinted_start(knotted_beg, min(hint[0] - id_beg, limit))
+        start_end = hinted_start(knotted_end, min(id_end - hint[1], limit))
+    if search == 'batch':
+        cut_beg = linear_cut(knotted_beg, limit, start_beg, boundary_beg)
+        cut_end = linear_cut(knotted_end, limit, start_end, boundary_end)
+    else:
+        cut_beg = cut_search(knotted_beg, limit, start_beg)
+        cut_end = cut_search(knotted_end, limit, start_end)
 
     act_kn = '0_1'
     while (act_kn != main_knot or prob < 0.8 * cutoff) and cut_beg + cut_end > 0:
@@ -209,12 +482,16 @@ def find_knotcore_simple(chain, gap=1, closure=1, tries=20, cutoff=0.42, max_cro
             cut_beg -= 1
         if cut_end > 0:
             cut_end -= 1
+        if search == 'batch' and (id_beg + cut_beg, id_end - cut_end) not in memo:
+            # the next candidates of the shrinking, both ends are decreased by one until they reach 0
+            find_subknots([(id_beg + max(cut_beg - k, 0), id_end - max(cut_end - k, 0)) for k in range(batch_size)])
         act_kn, prob = find_subknot(id_beg + cut_beg, id_end - cut_end)
 
     res_list = (id_beg + cut_beg, id_end - cut_end)
     return res_list
 
 
-def count_knotcore(file, closure, tries, max_cross):
-    res = find_knotcore_simple(file, closure=closure, tries=tries, max_cross=max_cross)
+def count_knotcore(chain, closure, tries, max_cross, search='linear', hint=None, adaptive=False):
+    res = find_knotcore_simple(chain, closure=closure, tries=tries, max_cross=max_cross, search=search, hint=hint,
+                               adaptive=adaptive)
     return res
@@ -0,0 +1,42 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+
+class FramePool:
+    """
+    Pool of processes, which evaluates independent per-frame calculations (e.g. the knot type or the knot core range
+    of a frame). With one worker, everything is calculated in the current process, so the results are always the same
+    as in the serial analysis.
+
+    Args:
+        workers (int, optional):
+                The number of worker processes.
+                Default: 1.
+    """
+    def __init__(self, workers=1):
+        self.workers = workers if workers is not None else 1
+        self._executor = None
+
+    def map(self, func, chains, **kwargs):
+        """
+        Function calls func(chain, **kwargs) for every given chain. The function must be defined on the module level,
+        so it can be sent to the worker processes.
+
+        Returns: list of the results in the order of the chains.
+        """
+        chains = list(chains)
+        if self.workers <= 1 or len(chains) < 2:
+            return [func(chain, **kwargs) for chain in chains]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        chunksize = max(1, math.ceil(len(chains) / (self.workers * 4)))
+        return list(self._executor.map(partial(func, **kwargs), chains, chunksize=chunksize))
+
+    def close(self):
+        """
+        Function stops the worker processes. The pool can still be used, the processes are started again if needed.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
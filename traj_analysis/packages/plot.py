@@ -1,42 +1,126 @@
 from packages.traj import *
+import numpy as np
 import plotly.graph_objs as go
 from plotly_resampler import FigureResampler
 
 
 class Plot:
-    def __init__(self, trajectory, plot_name, plot_scope, debug):
-        self.frame_list = trajectory.frame_list
-        self.knot_dict = trajectory.knot_dict
+    def __init__(self, trajectory, plot_name, plot_scope, debug, headless=False):
+        self.frame_list = trajectory.frame_list if trajectory is not None else []
+        self.knot_dict = trajectory.knot_dict if trajectory is not None else {}
+        # properties of the trajectory used by the plot, they are also kept in the plot data file (see save_data)
+        self.max_frame = trajectory.max_frame if trajectory is not None else 0
+        self.prot_len = trajectory.prot_len if trajectory is not None else 0
+        self.nterminus = trajectory.nterminus if trajectory is not None else True
         self.untied_list = []
         self.plot_dict = {}
+        # frames, in which the knot cores of plot_dict were calculated, for every knotting frame
+        self.plot_frames = {}
         self.trajectory = trajectory
         self.plot_name = plot_name
         self.plot_scope = plot_scope
         self.debug = debug
+        # in the headless mode the plot is only written to the file, without opening it (e.g. on a computing node)
+        self.headless = headless
+
+    @classmethod
+    def from_file(cls, path, plot_name, debug=False, headless=False):
+        """
+        Function creates the plot from the plot data file (see save_data), without the trajectory. The knot cores
+        are not calculated again, so the plot can be drawn again (e.g. with a different style) in seconds.
+
+        Args:
+            path (str):
+                    The path to the plot data file (.npz).
+            plot_name (str):
+                    The name of the file with the plot.
+            debug (bool, optional):
+                    The debug mode.
+                    Default: False.
+            headless (bool, optional):
+                    If True, the plot is only written to the file, without opening it.
+                    Default: False.
+
+        Returns: Plot ready to draw_plot.
+        """
+        data = load_plot_data(path)
+        plot = cls(None, plot_name, data["plot_scope"], debug, headless)
+        plot.knot_dict = data["knot_dict"]
+        plot.plot_dict = data["plot_dict"]
+        plot.plot_frames = data["plot_frames"]
+        plot.max_frame = data["max_frame"]
+        plot.prot_len = data["prot_len"]
+        plot.nterminus = data["nterminus"]
+        return plot
 
     def draw_plot(self):
         """
         Function prepares and processes data in order to draw the plot:
             1. Constructs the plot_dict, where the frames around which the knot was tied are keys and the values are
-               the knot core ranges in successive frames. The knot core ranges are necessary to draw the plot.
+               the knot core ranges in successive frames. The knot core ranges are necessary to draw the plot. The
+               plot_dict is not constructed again, if it was already prepared or loaded from the plot data file.
             2. Draws the plot of knot core range in the whole trajectory.
 
         Returns:
             The plot.
         """
-        self.plot_dict = self.prepare_data_to_plot()
-        self.generate_plot()
+        if self.trajectory is not None and len(self.plot_dict) == 0:
+            with profiler.stage("prepare_data_to_plot"):
+                self.plot_dict = self.prepare_data_to_plot()
+        with profiler.stage("generate_plot"):
+            self.generate_plot()
+
+    def save_data(self, path):
+        """
+        Function saves the results of the analysis (knot_dict) and the knot cores of the plot (plot_dict) into the
+        compact plot data file (.npz), from which the plot can be drawn without the trajectory (see from_file). The
+        knot core ranges are kept as int16 pairs (begin, end), -1 for the invalid values, and the sampled frames of all
+        knotting events as one array with the offsets of the events.
+        """
+        events = sorted(self.knot_dict)
+        core_type = np.int16 if self.prot_len < np.iinfo(np.int16).max else np.int32
+
+        def core_array(knotcores):
+            return np.array([knotcore if isinstance(knotcore, tuple) else (-1, -1) for knotcore in knotcores],
+                            dtype=core_type).reshape(-1, 2)
+
+        def value(frame, k):
+            values = self.knot_dict[frame]
+            return values[k] if len(values) > k and values[k] is not None else -1
+
+        series = [self.plot_frames.get(frame, []) for frame in events]
+        np.savez_compressed(
+            path,
+            knot_frames=np.array(events, dtype=np.int64),
+            knot_types=np.array([self.knot_dict[frame][0] for frame in events], dtype=str),
+            unknot_frames=np.array([value(frame, 1) for frame in events], dtype=np.int64),
+            knotcores=core_array([self.knot_dict[frame][2] if len(self.knot_dict[frame]) > 2 else None
+                                  for frame in events]),
+            way_of_knotting=np.array([value(frame, 3) for frame in events], dtype=np.int8),
+            loop_behavior=np.array([value(frame, 4) for frame in events], dtype=np.int8),
+            has_loop=np.array([len(self.knot_dict[frame]) == 5 for frame in events], dtype=bool),
+            series_offsets=np.cumsum([0] + [len(frames) for frames in series], dtype=np.int64),
+            series_frames=np.array([i for frames in series for i in frames], dtype=np.int64),
+            series_knotcores=core_array([knotcore for frame in events for knotcore in self.plot_dict.get(frame, [])]),
+            info=np.array([self.max_frame, self.prot_len, self.nterminus, self.plot_scope], dtype=np.int64))
 
     def prepare_data_to_plot(self):
         """
         Function creates a plot dict which is necessary to draw the plot. The keys are the frames around which the
         knot was tied, the values are the knot core ranges in successive frames. After knotting, the function
         calculates the knot value for 10 frames every one, then every plot_scope till the frame, where the knot
-        was unknotted.
+        was unknotted. If the last knot stays until the end of the trajectory, the last frame is added to the samples
+        of the last frame of frame_list, or to the last knot of knot_dict, if that frame was moved or removed during
+        the analysis.
+
+        The sampled frames are kept in plot_frames.
 
         Returns: plot_dict
         """
         self.plot_dict = {}
+        # frames, in which the knot core is calculated, for every knotting frame; the knot cores of all of them are
+        # calculated at once in the pool of the trajectory and then assigned back to the knotting frames
+        samples = {}
 
         # a variable that determines whether the knot core for the last frame should be counted
         if_end = False
@@ -44,35 +128,42 @@ class Plot:
         end_plot = True
 
         for i, frame in enumerate(self.knot_dict):
-            self.plot_dict[frame] = []
+            samples[frame] = []
             end = self.knot_dict[frame][1]
             if end is None:
-                end = self.trajectory.max_frame
+                end = self.max_frame
                 if_end = True
 
             # calculating the first 10 frames every 1
             for j in range(frame, frame + 11):
-                self.plot_dict[frame].append(knotcore_len(j, self.trajectory.lx, self.trajectory.closure,
-                                                          self.trajectory.tries, self.trajectory.max_cross))
+                samples[frame].append(j)
 
             # calculating remaining frames every plot_scope
             for j in range(frame + 10 + 100, end, self.plot_scope):
-                self.plot_dict[frame].append(knotcore_len(j, self.trajectory.lx, self.trajectory.closure,
-                                                          self.trajectory.tries, self.trajectory.max_cross))
-                if j == self.trajectory.max_frame:
+                samples[frame].append(j)
+                if j == self.max_frame:
                     end_plot = False
 
         if if_end and end_plot:
-            self.plot_dict[self.frame_list[-1]].append(knotcore_len(self.trajectory.max_frame, self.trajectory.lx,
-                                                                    self.trajectory.closure, self.trajectory.tries,
-                                                                    self.trajectory.max_cross))
+            # the last knot is tied until the end of the trajectory
+            last = self.frame_list[-1] if len(self.frame_list) > 0 and self.frame_list[-1] in samples else \
+                list(samples)[-1]
+            samples[last].append(self.max_frame)
+
+        knotcores = self.trajectory.knotcore_series(list(samples.values()))
+        for frame, frame_knotcores in zip(samples, knotcores):
+            self.plot_dict[frame] = frame_knotcores
+        self.plot_frames = samples
+
         return self.plot_dict
 
     def generate_plot(self):
         """
-        Function generates the plot in the following steps. It constructs lists of values for x and two lines y based
-        on plot_dict. Then, it gathers information about the knot's tying method and loop position and subsequently
-        plots (by using helper functions) the segments on the graph.
+        Function generates the plot in the following steps. For every knotting event of plot_dict, it constructs
+        the arrays of the sampled frames (x) and of the two lines (y) of the knot core range. Then, it gathers
+        information about the knot's tying method and loop position and subsequently plots (by using helper functions)
+        the segments on the graph. Only the sampled frames are drawn, so the size of the plot does not depend on the
+        length of the trajectory.
         """
 
         def draw_plot_section(name, x_range, y_range, mode, line, marker, showlegend, hover, fill, fillcolor):
@@ -158,150 +249,97 @@ class Plot:
 
         fig = (go.Figure())
         legend_entries = {}
-        x = []
-        i = 0
-
-        # without it, the plot "draws badly"
-        fig.add_trace(go.Scatter(
-            name=".",
-            x=[x for x in range(0, self.trajectory.max_frame, 1)],
-            y=[0] * self.trajectory.max_frame,
-            mode='lines',
-            line=dict(color='white', width=0.5),
-            hoverinfo='none',
-            showlegend=False))
 
         # information of the protein length
         fig.update_layout(
             annotations=[
                 go.layout.Annotation(
-                    text="Protein length: " + str(self.trajectory.prot_len),
+                    text="Protein length: " + str(self.prot_len),
                     xref="paper",
                     yref="y",
                     x=1.09,
-                    y=self.trajectory.prot_len,
+                    y=self.prot_len,
                     showarrow=False,
                     font=dict(color="black", size=15))])
 
-        while i <= self.trajectory.max_frame:
-            x.append(i)
-
-            if i in self.plot_dict:
-                fig.add_trace(go.Scatter(
-                    name='',
-                    x=x,
-                    y=[None] * len(x),
-                    marker=dict(color="#444"),
-                    showlegend=False))
-
-                y_upper = []
-                y_lower = []
-                temp_x = []
-                j = 0
-
-                for tup in self.plot_dict[i]:
-                    if tup is not None and tup != 0:
-                        y_lower.append(tup[0])
-                        y_upper.append(tup[1])
-                    else:
-                        y_lower.append(None)
-                        y_upper.append(None)
-                    temp_x.append(i + j)
+        for i in sorted(self.plot_dict):
+            temp_x = np.asarray(self.plot_frames[i])
+            y_lower, y_upper = knotcore_arrays(self.plot_dict[i])
 
-                    if j < 10:
-                        j += 1
+            knot = self.knot_dict[i][0]
 
-                    else:
-                        if i + j + self.plot_scope < self.trajectory.max_frame:
-                            j += self.plot_scope
-                        else:
-                            j = self.trajectory.max_frame - i
+            if knot not in legend_entries:
+                legend_entries[knot] = color_dict[knot][1]
 
-                knot = self.knot_dict[i][0]
+            color = color_dict[knot][0]
+            color10 = color_dict10[knot][0]
 
-                if knot not in legend_entries:
-                    legend_entries[knot] = color_dict[knot][1]
+            if self.knot_dict[i][2] == 1:
+                if self.nterminus:
+                    # Slipknot
+                    draw_plot_section("Slipknot", [i - 1, i], [0, y_lower[0]],
+                                      'lines', dict(dash='dot', color='black', width=1),
+                                      dict(color='black', size=6), False, "N-terminus", None, None)
+                else:
+                    draw_plot_section("Slipknot", [i - 1, i], [0, y_upper[0]],
+                                      'lines', dict(dash='dot', color='black', width=1),
+                                      dict(color='black', size=6), False, "N-terminus", None, None)
+
+            else:
+                # Normally
+                if self.nterminus:
+                    draw_plot_section("Normally", [i - 1, i], [0, y_lower[0]],
+                                      'lines', dict(dash='dash', color='black', width=1),
+                                      dict(color='black', size=6), False, "N-terminus", None, None)
+                else:
+                    draw_plot_section("Normally", [i - 1, i], [0, y_upper[0]],
+                                      'lines', dict(dash='dash', color='black', width=1),
+                                      dict(color='black', size=6), False, "C-terminus", None, None)
 
-                color = color_dict[knot][0]
-                color10 = color_dict10[knot][0]
+            fig.update_layout(hoverlabel=dict(font_size=14))
 
-                if self.knot_dict[i][2] == 1:
-                    if self.trajectory.nterminus:
-                        # Slipknot
-                        draw_plot_section("Slipknot", [i - 1, i], [0, self.plot_dict[i][0][0]],
-                                          'lines', dict(dash='dot', color='black', width=1),
-                                          dict(color='black', size=6), False, "N-terminus", None, None)
-                    else:
-                        draw_plot_section("Slipknot", [i - 1, i], [0, self.plot_dict[i][0][1]],
-                                          'lines', dict(dash='dot', color='black', width=1),
-                                          dict(color='black', size=6), False, "N-terminus", None, None)
+            info = ''
+            loop_color_l = "black"
+            loop_color_u = "black"
 
-                else:
-                    # Normally
-                    if self.trajectory.nterminus:
-                        draw_plot_section("Normally", [i - 1, i], [0, self.plot_dict[i][0][0]],
-                                          'lines', dict(dash='dash', color='black', width=1),
-                                          dict(color='black', size=6), False, "N-terminus", None, None)
+            if len(self.knot_dict[i]) == 5:
+                # behavior of the loop
+                if self.knot_dict[i][4] == 0:
+                    if self.nterminus:
+                        loop_color_u = "blue"
                     else:
-                        draw_plot_section("Normally", [i - 1, i], [0, self.plot_dict[i][0][1]],
-                                          'lines', dict(dash='dash', color='black', width=1),
-                                          dict(color='black', size=6), False, "C-terminus", None, None)
-
-                fig.update_layout(hoverlabel=dict(font_size=14))
-
-                info = ''
-                loop_color_l = "black"
-                loop_color_u = "black"
-
-                if len(self.knot_dict[i]) == 5:
-                    # behavior of the loop
-                    if self.knot_dict[i][4] == 0:
-                        if self.trajectory.nterminus:
-                            loop_color_u = "blue"
-                        else:
-                            loop_color_l = "blue"
-                        info = "loop tightens"
-                    if self.knot_dict[i][4] == 1:
-                        if self.trajectory.nterminus:
-                            loop_color_u = "green"
-                        else:
-                            loop_color_l = "green"
-                        info = "loop in place"
-                    if self.knot_dict[i][4] == 2:
-                        if self.trajectory.nterminus:
-                            loop_color_u = "red"
-                        else:
-                            loop_color_l = "red"
-                        info = "loop expands"
-
-                # plot rest of the plot every scope_plot
-                draw_plot_section(knot, temp_x[10:], y_lower[10:], 'lines+markers', dict(color='black', width=1),
-                                  dict(symbol='circle', size=6), False, None, 'tozeroy', 'rgba(0,0,0,0)')
-
-                draw_plot_section(knot, temp_x[10:], y_upper[10:], 'lines+markers', dict(color='black', width=1),
-                                  dict(symbol='circle', size=6), False, None, 'tonexty', color)
-
-                # draw first 10 frames
-                draw_plot_section(knot, temp_x[:11], y_lower[:11], 'lines+markers', dict(color=loop_color_l, width=1),
-                                  dict(symbol='circle', size=6), False, None, 'tozeroy', 'rgba(0,0,0,0)')
-
-                draw_plot_section(knot, temp_x[:11], y_upper[:11], 'lines+markers', dict(color=loop_color_u, width=1),
-                                  dict(symbol='circle', size=6), False, "%{y}, " + info, 'tonexty', color10)
-
-                x = [temp_x[-1] + 1]
-
-            if i == self.trajectory.max_frame:
-                fig.add_trace(go.Scatter(
-                    name='',
-                    x=x,
-                    y=[None] * len(x),
-                    marker=dict(color="#444"),
-                    showlegend=False))
-            i += 1
+                        loop_color_l = "blue"
+                    info = "loop tightens"
+                if self.knot_dict[i][4] == 1:
+                    if self.nterminus:
+                        loop_color_u = "green"
+                    else:
+                        loop_color_l = "green"
+                    info = "loop in place"
+                if self.knot_dict[i][4] == 2:
+                    if self.nterminus:
+                        loop_color_u = "red"
+                    else:
+                        loop_color_l = "red"
+                    info = "loop expands"
+
+            # plot rest of the plot every scope_plot
+            draw_plot_section(knot, temp_x[10:], y_lower[10:], 'lines+markers', dict(color='black', width=1),
+                              dict(symbol='circle', size=6), False, None, 'tozeroy', 'rgba(0,0,0,0)')
+
+            draw_plot_section(knot, temp_x[10:], y_upper[10:], 'lines+markers', dict(color='black', width=1),
+                              dict(symbol='circle', size=6), False, None, 'tonexty', color)
+
+            # draw first 10 frames
+            draw_plot_section(knot, temp_x[:11], y_lower[:11], 'lines+markers', dict(color=loop_color_l, width=1),
+                              dict(symbol='circle', size=6), False, None, 'tozeroy', 'rgba(0,0,0,0)')
+
+            draw_plot_section(knot, temp_x[:11], y_upper[:11], 'lines+markers', dict(color=loop_color_u, width=1),
+                              dict(symbol='circle', size=6), False, "%{y}, " + info, 'tonexty', color10)
 
         fig.update_layout(
             yaxis=dict(
-                range=[0, self.trajectory.prot_len],
+                range=[0, self.prot_len],
                 title='Residue index',
                 title_font=dict(
                     color='black',
@@ -315,7 +353,9 @@ class Plot:
                 tickwidth=2,
                 tickcolor='black'),
 
-            xaxis=dict(title='Frame',
+            # the whole trajectory is shown, also the frames without a knot
+            xaxis=dict(range=[0, self.max_frame],
+                       title='Frame',
                        title_font=dict(color='black', size=15, family='Arial')),
             title='The knot core plot',
             title_font=dict(
@@ -367,5 +407,44 @@ class Plot:
 
         resampled_fig = FigureResampler(fig)
 
-        resampled_fig.show()
+        if not self.headless:
+            resampled_fig.show()
         resampled_fig.write_html(self.plot_name + '.html')
+
+
+def knotcore_arrays(knotcores):
+    """
+    Function converts the knot core values of the sampled frames into the arrays of the lower and upper lines of the
+    plot, the invalid values (None or 0) are NaN, so they make gaps in the lines.
+
+    Returns: tuple of two float arrays (the begins and the ends of the knot core ranges).
+    """
+    ranges = np.array([knotcore if isinstance(knotcore, tuple) else (np.nan, np.nan) for knotcore in knotcores],
+                      dtype=float).reshape(-1, 2)
+    return ranges[:, 0], ranges[:, 1]
+
+
+def load_plot_data(path):
+    """
+    Function reads the plot data file written by Plot.save_data.
+
+    Returns: dictionary with the knot_dict, plot_dict and plot_frames (as in Plot) and the max_frame, prot_len,
+             nterminus and plot_scope of the analysis.
+    """
+    with np.load(path) as data:
+        max_frame, prot_len, nterminus, plot_scope = (int(value) for value in data["info"])
+        knot_dict, plot_dict, plot_frames = {}, {}, {}
+        offsets = data["series_offsets"]
+        for k, frame in enumerate(data["knot_frames"].tolist()):
+            begin, end = data["knotcores"][k].tolist()
+            unknot_frame = int(data["unknot_frames"][k])
+            values = [str(data["knot_types"][k]), unknot_frame if unknot_frame >= 0 else None,
+                      (begin, end) if begin >= 0 else None, int(data["way_of_knotting"][k])]
+            if data["has_loop"][k]:
+                values.append(int(data["loop_behavior"][k]))
+            knot_dict[frame] = values
+            plot_frames[frame] = data["series_frames"][offsets[k]:offsets[k + 1]].tolist()
+            plot_dict[frame] = [(begin, end) if begin >= 0 else None for begin, end in
+                                data["series_knotcores"][offsets[k]:offsets[k + 1]].tolist()]
+    return {"knot_dict": knot_dict, "plot_dict": plot_dict, "plot_frames": plot_frames, "max_frame": max_frame,
+            "prot_len": prot_len, "nterminus": bool(nterminus), "plot_scope": plot_scope}
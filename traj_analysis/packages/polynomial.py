@@ -0,0 +1,181 @@
+import numpy as np
+from packages.geometry import close_chains
+
+# knot types recognized by the engine, the code of the knot type is its index in this table
+KNOT_TYPES = ('0_1', '3_1', '4_1', '5_1', '5_2', '6_1', '6_2', '6_3')
+# code of the structures, which are not in the table
+UNKNOWN_KNOT = 255
+
+# Alexander polynomials of the knot types in the table (the coefficients from the lowest power, normalized so that the
+# lowest power is t^0 and the first coefficient is positive), a structure is recognized only if its whole polynomial
+# is in the table
+POLYNOMIALS = {(1,): 0, (1, -1, 1): 1, (1, -3, 1): 2, (1, -1, 1, -1, 1): 3, (2, -3, 2): 4, (2, -5, 2): 5,
+               (1, -3, 3, -3, 1): 6, (1, -3, 5, -3, 1): 7}
+
+# fixed rotation applied before the projection, so that the structures aligned with the axes are not projected in
+# a degenerate way
+_a, _b, _c = 0.4728, 1.1326, 2.3519
+ROTATION = np.array([[np.cos(_a), -np.sin(_a), 0], [np.sin(_a), np.cos(_a), 0], [0, 0, 1]]) @ \
+    np.array([[1, 0, 0], [0, np.cos(_b), -np.sin(_b)], [0, np.sin(_b), np.cos(_b)]]) @ \
+    np.array([[np.cos(_c), -np.sin(_c), 0], [np.sin(_c), np.cos(_c), 0], [0, 0, 1]])
+
+
+def knot_codes(chains, closure=1, batch_size=64):
+    """
+    Built-in engine calculating the knot types of many structures at once. The open chains are closed like by topoly
+    (only the deterministic closure is supported), projected on a plane and the Alexander polynomial is calculated
+    and compared with the polynomials of the knot types of the table KNOT_TYPES. All steps are vectorized over the
+    structures with NumPy, so there is no per-structure overhead of passing the coordinates to topoly.
+
+    Args:
+        chains (array-like):
+                Coordinates of the chains, shape (frames, atoms, 3).
+        closure (int, optional):
+                The method to close the chain, only 1 (the closure through the center of mass) is supported.
+                Default: 1.
+        batch_size (int, optional):
+                The number of structures processed at once, it limits the memory used by the crossing matrices.
+                Default: 64.
+
+    Returns:
+        Array of uint8 codes of the knot types (indexes in KNOT_TYPES), UNKNOWN_KNOT for the structures, which are not
+        in the table (e.g. more complex or composite knots) and for the chains, whose closure is not well defined
+        (see close_chains), so they are passed to topoly.
+    """
+    if closure != 1:
+        raise ValueError("The built-in engine supports only the closure 1.")
+    chains = np.asarray(chains)
+    codes = np.empty(len(chains), dtype=np.uint8)
+    for start in range(0, len(chains), batch_size):
+        polygons, ambiguous = close_chains(chains[start:start + batch_size])
+        codes[start:start + batch_size] = np.where(ambiguous, UNKNOWN_KNOT, polygon_knot_codes(polygons))
+    return codes
+
+
+def polygon_knot_codes(polygons):
+    """
+    Function calculates the knot type codes of the closed polygons (see knot_codes).
+
+    Args:
+        polygons (np.ndarray):
+                Vertices of the polygons, shape (frames, vertices, 3), the last vertex is connected to the first one.
+
+    Returns: array of uint8 codes of the knot types.
+    """
+    return np.array([POLYNOMIALS.get(polynomial, UNKNOWN_KNOT) for polynomial in alexander_polynomials(polygons)],
+                    dtype=np.uint8)
+
+
+def alexander_polynomials(polygons):
+    """
+    Function calculates the Alexander polynomials of the polygons. The determinant of the Alexander matrix of a
+    projection with n crossings is ±t^k Δ(t) of degree below n, so it is evaluated in the n-th roots of unity and
+    its integer coefficients are recovered by the Fourier transform.
+
+    Returns: list of tuples of the coefficients of the polynomials normalized like in POLYNOMIALS, None for the
+             polygons, whose coefficients are not (numerically) integer.
+    """
+    if len(polygons) == 0:
+        return []
+    constant, linear = alexander_matrices(polygons)
+    size = constant.shape[1]
+    values = np.stack([np.linalg.det(constant + np.exp(2j * np.pi * k / size) * linear) for k in range(size)], axis=1)
+    coefficients = np.fft.fft(values, axis=1) / size
+    rounded = np.rint(coefficients.real).astype(int)
+    exact = np.all(np.abs(coefficients - rounded) < 0.05, axis=1)
+
+    polynomials = []
+    for row, ok in zip(rounded, exact):
+        nonzero = np.flatnonzero(row)
+        if not ok or len(nonzero) == 0:
+            polynomials.append(None)
+            continue
+        row = row[nonzero[0]:nonzero[-1] + 1]
+        polynomials.append(tuple(int(value) for value in (row if row[0] > 0 else -row)))
+    return polynomials
+
+
+def find_crossings(polygons):
+    """
+    Function projects the polygons on the plane after the fixed rotation and finds the crossings of the projections
+    of all pairs of non-adjacent edges.
+
+    Returns:
+        Tuple of flat arrays describing the crossings: frame, position of the over passage and of the under passage
+        along the polygon (edge number + fraction of the edge) and the sign of the crossing (True if right-handed).
+    """
+    points = polygons @ ROTATION.T
+    n = points.shape[1]
+    steps = np.roll(points, -1, axis=1) - points
+
+    first, second = np.triu_indices(n, k=2)
+    non_adjacent = ~((first == 0) & (second == n - 1))
+    first, second = first[non_adjacent], second[non_adjacent]
+
+    p, r = points[:, first, :2], steps[:, first, :2]
+    q, w = points[:, second, :2], steps[:, second, :2]
+    denominator = r[..., 0] * w[..., 1] - r[..., 1] * w[..., 0]
+    safe = np.where(denominator != 0, denominator, 1)
+    qp = q - p
+    s = (qp[..., 0] * w[..., 1] - qp[..., 1] * w[..., 0]) / safe
+    u = (qp[..., 0] * r[..., 1] - qp[..., 1] * r[..., 0]) / safe
+    crossing = (denominator != 0) & (s > 0) & (s < 1) & (u > 0) & (u < 1)
+
+    frame, pair = np.nonzero(crossing)
+    s, u, denominator = s[frame, pair], u[frame, pair], denominator[frame, pair]
+    i, j = first[pair], second[pair]
+    height_i = points[frame, i, 2] + s * steps[frame, i, 2]
+    height_j = points[frame, j, 2] + u * steps[frame, j, 2]
+    i_over = height_i > height_j
+
+    over = np.where(i_over, i + s, j + u)
+    under = np.where(i_over, j + u, i + s)
+    # the sign of the crossing is given by the orientation of the over and under strands in the projection
+    right_handed = np.where(i_over, denominator, -denominator) < 0
+    return frame, over, under, right_handed
+
+
+def alexander_matrices(polygons):
+    """
+    Function builds the Alexander matrix of the projection of every polygon (one row per crossing, one column per arc
+    between the under passages) and removes its last row and column. The matrices of the polygons with fewer
+    crossings are padded with the identity.
+
+    Returns: tuple of arrays (constant, linear), shape (frames, size, size), the matrices are constant + t * linear.
+    """
+    n_frames = len(polygons)
+    frame, over, under, right_handed = find_crossings(polygons)
+    n_crossings = np.bincount(frame, minlength=n_frames)
+    size = max(int(n_crossings.max()) if n_frames else 0, 1)
+
+    # the passages of all crossings sorted along the polygons, the arcs are numbered by the under passages
+    k = len(frame)
+    passage_frame = np.concatenate([frame, frame])
+    passage_position = np.concatenate([over, under])
+    passage_under = np.concatenate([np.zeros(k, dtype=int), np.ones(k, dtype=int)])
+    order = np.lexsort((passage_position, passage_frame))
+    unders_before = np.cumsum(passage_under[order]) - passage_under[order]
+    frame_start = np.searchsorted(passage_frame[order], np.arange(n_frames))
+    first_in_frame = unders_before[np.minimum(frame_start, max(2 * k - 1, 0))] if k else np.zeros(n_frames, dtype=int)
+    arcs = np.empty(2 * k, dtype=int)
+    arcs[order] = (unders_before - first_in_frame[passage_frame[order]]) % np.maximum(n_crossings[passage_frame[order]],
+                                                                                     1)
+    over_arc, in_arc = arcs[:k], arcs[k:]
+    out_arc = (in_arc + 1) % np.maximum(n_crossings[frame], 1)
+
+    # the matrix is constant + t * linear: 1 - t at the over arc, t and -1 at the incoming and outgoing under arcs of
+    # the right-handed crossing, -1 and t of the left-handed one
+    constant = np.zeros((n_frames, size, size))
+    linear = np.zeros((n_frames, size, size))
+    np.add.at(constant, (frame, in_arc, over_arc), 1)
+    np.add.at(linear, (frame, in_arc, over_arc), -1)
+    np.add.at(linear, (frame, in_arc, np.where(right_handed, in_arc, out_arc)), 1)
+    np.add.at(constant, (frame, in_arc, np.where(right_handed, out_arc, in_arc)), -1)
+
+    # removing the last row and column of every matrix
+    padded = np.arange(size)[None, :] >= (n_crossings - 1)[:, None]
+    padded = padded[:, :, None] | padded[:, None, :]
+    identity = np.broadcast_to(np.eye(size), padded.shape)
+    constant = np.where(padded, identity, constant)
+    linear = np.where(padded, 0, linear)
+    return constant, linear
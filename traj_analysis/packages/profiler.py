@@ -0,0 +1,161 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import os
+import time
+try:
+    import resource
+except ImportError:
+    # not available on Windows, the peak memory is not reported there
+    resource = None
+
+# profiler, which records the calls of the module level functions (knot_type, alexander, ...), see Profiler.activate
+_active = None
+
+
+class Profiler:
+    """
+    Instrumentation of the analysis: the wall time of every stage (e.g. the stages of Traj.calculate), the numbers of
+    calls of the expensive functions and the total time spent in them. The stages and the timed calls are also kept
+    as the events of a timeline, which can be saved in the Chrome trace format (chrome://tracing, Perfetto).
+
+    Only the calls made in the current process are counted, the calculations done in the worker processes are
+    recorded as the stages of the main process, which wait for them.
+
+    Args:
+        max_events (int, optional):
+                The maximum number of the events kept for the timeline, the later ones are only summed.
+                Default: 100000.
+    """
+    def __init__(self, max_events=100000):
+        self.max_events = max_events
+        self.stages = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.times = defaultdict(float)
+        self.frames_loaded = None
+        self.events = []
+        self._origin = time.perf_counter()
+
+    def activate(self):
+        """
+        Function makes the profiler the one, which records the calls of the module level functions.
+        """
+        global _active
+        _active = self
+
+    def deactivate(self):
+        global _active
+        if _active is self:
+            _active = None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Context manager measuring the wall time of one stage of the analysis. The same stage can be entered many
+        times, the times are summed.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.stages[name] += end - start
+            self._event(name, "stage", start, end)
+
+    @contextmanager
+    def timed(self, name):
+        """
+        Context manager counting the call of the function and measuring its time.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.counts[name] += 1
+            self.times[name] += end - start
+            self._event(name, "call", start, end)
+
+    def _event(self, name, category, start, end):
+        if len(self.events) < self.max_events:
+            self.events.append({"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": 0,
+                                "ts": (start - self._origin) * 1e6, "dur": (end - start) * 1e6})
+
+    @staticmethod
+    def peak_rss():
+        """
+        Returns: tuple (peak resident memory of the process, peak resident memory of the largest of its finished
+                 worker processes) in MB, (None, None) if it is not available on this platform. The peaks are not
+                 added, they are not reached at the same time.
+        """
+        if resource is None:
+            return None, None
+        # ru_maxrss is in kilobytes on Linux
+        return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+    def report(self):
+        """
+        Returns: dictionary with the stage times (s), the numbers of calls, the times of the calls (s), the number of
+                 the frames loaded from the trajectory and the peak memory (MB) of the process and of its largest
+                 worker process.
+        """
+        peak, workers_peak = self.peak_rss()
+        return {"stages": dict(self.stages), "counts": dict(self.counts), "times": dict(self.times),
+                "topoly_time": self.times.get("alexander", 0.0), "frames_loaded": self.frames_loaded,
+                "peak_rss_mb": peak, "peak_rss_workers_mb": workers_peak}
+
+    def summary(self):
+        """
+        Returns: the report as a readable string (debug mode).
+        """
+        lines = ["Profile of the analysis:"]
+        for name, seconds in self.stages.items():
+            lines.append(f"  stage {name}: {seconds:.3f} s")
+        for name, count in self.counts.items():
+            timing = f", {self.times[name]:.3f} s" if name in self.times else ""
+            lines.append(f"  {name}: {count} calls{timing}")
+        peak, workers_peak = self.peak_rss()
+        lines.append(f"  frames loaded: {self.frames_loaded}, peak RSS: "
+                     f"{'unknown' if peak is None else f'{peak:.1f} MB'}, largest worker: "
+                     f"{'unknown' if workers_peak is None else f'{workers_peak:.1f} MB'}")
+        return "\n".join(lines)
+
+    def dump_trace(self, path):
+        """
+        Function saves the timeline of the stages and calls in the Chrome trace JSON format.
+        """
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms", "otherData": self.report()}, trace_file)
+
+
+def count(name, n=1):
+    """
+    Function counts the calls of the function in the active profiler (if any).
+    """
+    if _active is not None:
+        _active.counts[name] += n
+
+
+@contextmanager
+def timed(name):
+    """
+    Context manager counting and timing the call in the active profiler (if any).
+    """
+    if _active is None:
+        yield
+    else:
+        with _active.timed(name):
+            yield
+
+
+@contextmanager
+def stage(name):
+    """
+    Context manager measuring the stage in the active profiler (if any).
+    """
+    if _active is None:
+        yield
+    else:
+        with _active.stage(name):
+            yield
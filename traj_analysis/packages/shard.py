@@ -0,0 +1,73 @@
+import os
+import pickle
+import tempfile
+
+
+def save_shard(path, result):
+    """
+    Function saves the result of the shard of the analysis (see Traj.analyze_shard), so it can be merged by another
+    process. The file is replaced atomically.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as shard_file:
+            pickle.dump(result, shard_file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def load_shard(path):
+    """
+    Returns: the result of the shard of the analysis saved by save_shard.
+    """
+    with open(path, "rb") as shard_file:
+        return pickle.load(shard_file)
+
+
+def owned(pairs, shard):
+    """
+    Returns: the found frames of the pairs (frame of the coarse search, found frame), which belong to the shard: the
+             frames of the coarse search are in the range of the shard.
+    """
+    return [frame for checked, frame in pairs if shard["start"] <= checked < shard["end"]]
+
+
+def check_shards(shards, params):
+    """
+    Function checks, if the shards cover the whole trajectory without gaps and overlaps, if they were calculated with
+    the given parameters of the analysis, and if the candidates found by every shard in its halo are the same as the
+    ones found by the shards, to which they belong.
+
+    Returns: the shards sorted by their first frames.
+    """
+    shards = sorted(shards, key=lambda shard: shard["start"])
+    if len(shards) == 0:
+        raise ValueError("No shards to merge.")
+    for shard in shards:
+        if shard["params"] != params:
+            raise ValueError(f"The shard [{shard['start']}, {shard['end']}) was calculated with different parameters "
+                             f"of the analysis.")
+    ends = [0] + [shard["end"] for shard in shards]
+    for shard, end in zip(shards, ends):
+        if shard["start"] != end:
+            raise ValueError(f"The shards do not cover the trajectory: the shard [{shard['start']}, {shard['end']}) "
+                             f"starts after the frame {end}.")
+    if ends[-1] != params["frames"]:
+        raise ValueError(f"The shards do not cover the trajectory: the last shard ends at {ends[-1]}, the trajectory "
+                         f"has {params['frames']} frames.")
+
+    for shard in shards:
+        for other in shards:
+            if other is shard:
+                continue
+            first, last = max(shard["searched"][0], other["start"]), min(shard["searched"][1], other["end"])
+            for key in ("knotting", "unknotting"):
+                if [pair for pair in shard[key] if first <= pair[0] < last] != \
+                        [pair for pair in other[key] if first <= pair[0] < last]:
+                    raise ValueError(f"The shards [{shard['start']}, {shard['end']}) and [{other['start']}, "
+                                     f"{other['end']}) found different moments of {key} in the frames [{first}, "
+                                     f"{last}).")
+    return shards
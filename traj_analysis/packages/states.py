@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class KnotStates:
+    """
+    Index of the knotted/unknotted states of all frames of the trajectory (e.g. the knot timeline, see
+    Traj.knot_timeline), which answers the questions about the windows of frames in O(1): the number of the knotted
+    frames in the window (by the cumulative sum of the states) and the first unknotted frame in the window (by the
+    index of the next unknotted frame after every frame).
+
+    Args:
+        knotted (array-like):
+                The boolean state of every frame, True if the frame is knotted (its knot type is not '0_1').
+    """
+    def __init__(self, knotted):
+        knotted = np.asarray(knotted, dtype=bool)
+        self.knotted = knotted
+        self.prefix = np.concatenate([[0], np.cumsum(knotted, dtype=np.int64)])
+        # the first unknotted frame at or after every frame, the number of frames if there is no such frame
+        frames = np.where(knotted, len(knotted), np.arange(len(knotted)))
+        self.next_unknotted = np.append(np.minimum.accumulate(frames[::-1])[::-1], len(knotted))
+
+    @classmethod
+    def from_timeline(cls, codes, knot_types):
+        """
+        Returns: the index of the states of the knot timeline (codes of the knot types of all frames and their names).
+        """
+        codes = np.asarray(codes)
+        if '0_1' not in knot_types:
+            return cls(np.ones(len(codes), dtype=bool))
+        return cls(codes != list(knot_types).index('0_1'))
+
+    def __len__(self):
+        return len(self.knotted)
+
+    def covers(self, start, end):
+        """
+        Returns: True if the window range(start, end) lies inside the trajectory, False if it has to be walked frame by
+                 frame (e.g. the window with the negative frames, which are counted from the end of the trajectory).
+        """
+        return 0 <= start <= end <= len(self.knotted)
+
+    def knotted_count(self, start, end):
+        """
+        Returns: the number of the knotted frames in range(start, end).
+        """
+        return int(self.prefix[end] - self.prefix[start])
+
+    def knotted_counts(self, starts, length):
+        """
+        Returns: the array of the numbers of the knotted frames in the windows of the given length starting in starts.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        return self.prefix[starts + length] - self.prefix[starts]
+
+    def first_unknotted(self, start, end):
+        """
+        Returns: the first unknotted frame in range(start, end) or None, if all frames are knotted.
+        """
+        frame = int(self.next_unknotted[start])
+        return frame if frame < end else None
@@ -0,0 +1,135 @@
+import hashlib
+import sqlite3
+
+
+class ResultStore:
+    """
+    Persistent store of the knot types and knot core ranges calculated for the frames of a trajectory. The results
+    are kept in an SQLite file (by default a sidecar next to the trajectory), so the repeated analyses of the same
+    trajectory, e.g. with different min_gap, scope, min_knot or plot_scope, do not calculate them again.
+
+    Every result is stored under the content hash of the coordinates of the frame and the parameters of the
+    calculation (closure, tries, max_cross), therefore the store stays valid even if the trajectory file is
+    modified or the frames are renumbered. The knot types are also kept separately for every method of their
+    calculation (e.g. the random closures stopped early, see knot_type_method) and the knot core ranges for every
+    method of the boundary search (see find_knotcore_simple and knotcore_label), so the results of different methods
+    are never mixed.
+
+    Args:
+        path (str):
+                The path to the SQLite file. It is created if it does not exist.
+        commit_every (int, optional):
+                Number of new results after which they are written to the disk.
+                Default: 1000.
+    """
+    # marker of the knot core ranges, which were calculated but are not valid (see knotcore_len)
+    NO_KNOTCORE = 0
+    INVALID_KNOTCORE = 1
+    KNOTCORE = 2
+    # version of the tables, the stores of the older versions are emptied (their results are calculated again)
+    VERSION = 1
+
+    def __init__(self, path, commit_every=1000):
+        self.path = path
+        self.commit_every = commit_every
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._connection = sqlite3.connect(path)
+        if self._connection.execute("PRAGMA user_version").fetchone()[0] < self.VERSION:
+            # the results of the older stores do not say, by which method they were calculated
+            self._connection.execute("DROP TABLE IF EXISTS knot_type")
+            self._connection.execute("DROP TABLE IF EXISTS knotcore")
+            self._connection.execute(f"PRAGMA user_version = {self.VERSION}")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS knot_type (frame_hash TEXT, closure INTEGER, "
+                                 "tries INTEGER, max_cross INTEGER, method TEXT, knot TEXT, "
+                                 "PRIMARY KEY (frame_hash, closure, tries, max_cross, method))")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS knotcore (frame_hash TEXT, closure INTEGER, "
+                                 "tries INTEGER, max_cross INTEGER, search TEXT, status INTEGER, beg INTEGER, "
+                                 "end_ INTEGER, PRIMARY KEY (frame_hash, closure, tries, max_cross, search))")
+        self._connection.commit()
+
+    @staticmethod
+    def sidecar_path(file):
+        """
+        Returns: the default path of the store for the given trajectory file.
+        """
+        return file + ".knots.sqlite"
+
+    @staticmethod
+    def frame_hash(coords):
+        """
+        Returns: the content hash of the coordinates of one frame.
+        """
+        return hashlib.sha1(coords.tobytes()).hexdigest()
+
+    def get_knot_type(self, coords, closure, tries, max_cross, methods=('topoly',)):
+        """
+        Returns: the stored knot type of the frame calculated by one of the given methods or None, if it was not
+                 calculated yet.
+        """
+        row = self._connection.execute(f"SELECT knot FROM knot_type WHERE frame_hash=? AND closure=? AND tries=? "
+                                       f"AND max_cross=? AND method IN ({', '.join('?' * len(methods))})",
+                                       (self.frame_hash(coords), closure, tries, max_cross) +
+                                       tuple(methods)).fetchone()
+        self._count(row)
+        return None if row is None else row[0]
+
+    def put_knot_type(self, coords, closure, tries, max_cross, knot, method='topoly'):
+        self._connection.execute("INSERT OR REPLACE INTO knot_type VALUES (?, ?, ?, ?, ?, ?)",
+                                 (self.frame_hash(coords), closure, tries, max_cross, method, str(knot)))
+        self._written()
+
+    def get_knotcore(self, coords, closure, tries, max_cross, search='linear'):
+        """
+        Returns: tuple (found, knot core value), where the knot core value has the same meaning as the result of the
+                 knotcore_len function.
+        """
+        row = self._connection.execute("SELECT status, beg, end_ FROM knotcore WHERE frame_hash=? AND closure=? "
+                                       "AND tries=? AND max_cross=? AND search=?",
+                                       (self.frame_hash(coords), closure, tries, max_cross, search)).fetchone()
+        self._count(row)
+        if row is None:
+            return False, None
+        status, beg, end = row
+        if status == self.NO_KNOTCORE:
+            return True, 0
+        if status == self.INVALID_KNOTCORE:
+            return True, None
+        return True, (beg, end)
+
+    def put_knotcore(self, coords, closure, tries, max_cross, knotcore, search='linear'):
+        if knotcore is None:
+            row = (self.INVALID_KNOTCORE, None, None)
+        elif isinstance(knotcore, int):
+            row = (self.NO_KNOTCORE, None, None)
+        else:
+            row = (self.KNOTCORE, int(knotcore[0]), int(knotcore[1]))
+        self._connection.execute("INSERT OR REPLACE INTO knotcore VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (self.frame_hash(coords), closure, tries, max_cross, search) + row)
+        self._written()
+
+    def _count(self, row):
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._connection.commit()
+            self._pending = 0
+
+    def close(self):
+        """
+        Function writes all pending results to the disk and closes the store.
+        """
+        self._connection.commit()
+        self._connection.close()
+
+    def stats(self):
+        """
+        Returns: string with the hit/miss counters of the store.
+        """
+        return f"result store {self.path}: {self.hits} hits, {self.misses} misses"
@@ -0,0 +1,137 @@
+import numpy as np
+
+# distance between the consecutive beads (CA atoms) in nanometers
+BOND = 0.38
+
+
+def resample(curve, n_points, closed=False):
+    """
+    Function places n_points points evenly (by the arc length) along the polyline.
+
+    Returns: array of shape (n_points, 3).
+    """
+    if closed:
+        curve = np.vstack([curve, curve[:1]])
+    lengths = np.concatenate([[0], np.cumsum(np.linalg.norm(np.diff(curve, axis=0), axis=1))])
+    positions = np.linspace(0, lengths[-1], n_points, endpoint=not closed)
+    return np.stack([np.interp(positions, lengths, curve[:, k]) for k in range(3)], axis=1)
+
+
+def knotted_chain(n_beads, core_beads=None):
+    """
+    Function builds the open chain with the trefoil knot in the middle: the tight trefoil is tied on core_beads beads
+    and the tails go straight outward, far from the knot, so every closure of the chain gives the trefoil.
+
+    Returns: tuple (coordinates of shape (n_beads, 3), (first, last) bead of the knotted part).
+    """
+    if core_beads is None:
+        core_beads = min(max(24, n_beads // 3), 120)
+    core_beads = min(core_beads, n_beads - 4)
+    s = np.linspace(0, 2 * np.pi, 400, endpoint=False)
+    trefoil = np.c_[np.sin(s) + 2 * np.sin(2 * s), np.cos(s) - 2 * np.cos(2 * s), -np.sin(3 * s)]
+    # the knot is opened at its outermost point
+    trefoil = np.roll(trefoil, -np.argmax(np.linalg.norm(trefoil, axis=1)), axis=0)
+    core = resample(trefoil, core_beads + 1, closed=True)[1:]
+    core *= BOND / np.linalg.norm(np.diff(core, axis=0), axis=1).mean()
+
+    outward = trefoil[0] / np.linalg.norm(trefoil[0])
+    up = np.array([0, 0, 1.0])
+    n_first = (n_beads - core_beads) // 2
+    n_last = n_beads - core_beads - n_first
+    first_direction = (outward + 0.2 * up) / np.linalg.norm(outward + 0.2 * up)
+    last_direction = (outward - 0.2 * up) / np.linalg.norm(outward - 0.2 * up)
+    first_tail = core[0] + first_direction * BOND * np.arange(n_first, 0, -1)[:, None]
+    last_tail = core[-1] + last_direction * BOND * np.arange(1, n_last + 1)[:, None]
+    return np.vstack([first_tail, core, last_tail]), (n_first, n_first + core_beads - 1)
+
+
+def unknotted_chain(n_beads):
+    """
+    Function builds the unknotted chain: a wide helix with n_beads beads.
+
+    Returns: coordinates of shape (n_beads, 3).
+    """
+    turn = 2 * np.pi / 20
+    radius = BOND / (2 * np.sin(turn / 2)) * 0.9
+    rise = np.sqrt(max(BOND ** 2 - (2 * radius * np.sin(turn / 2)) ** 2, 0))
+    i = np.arange(n_beads)
+    return np.c_[radius * np.cos(i * turn), radius * np.sin(i * turn), rise * i]
+
+
+def knotted_frames(n_frames, events):
+    """
+    Returns: boolean array, True for the frames, in which the chain is knotted according to the events.
+    """
+    knotted = np.zeros(n_frames, dtype=bool)
+    for knotting, unknotting in events:
+        knotted[knotting:unknotting if unknotting is not None else n_frames] = True
+    return knotted
+
+
+def synthetic_frames(start, count, n_beads, events, noise=0.01, seed=0):
+    """
+    Function generates the frames start, ..., start + count - 1 of the synthetic trajectory (see
+    synthetic_trajectory), so the long trajectory can be generated in parts. The noise depends on the seed and on
+    the first frame of the part.
+
+    Returns: array of shape (count, n_beads, 3), float32, in nanometers.
+    """
+    knot, _ = knotted_chain(n_beads)
+    unknot = unknotted_chain(n_beads)
+    state = knotted_frames(start + count, events)[start:]
+    frames = np.where(state[:, None, None], knot, unknot).astype(np.float32)
+    rng = np.random.default_rng([seed, start])
+    frames += rng.normal(scale=noise, size=frames.shape).astype(np.float32)
+    return frames
+
+
+def synthetic_trajectory(n_frames, n_beads, events, noise=0.01, seed=0):
+    """
+    Function generates the trajectory with known knotting and unknotting frames, e.g. for the benchmarks. The chain
+    is unknotted (a helix) outside the events and tied in a trefoil knot during them, the frames get a small random
+    noise.
+
+    Args:
+        n_frames (int):
+                The number of frames.
+        n_beads (int):
+                The number of beads (atoms) of the chain.
+        events (list of tuples (int, int or None)):
+                The knotting frames and the unknotting frames (None if the knot stays until the end).
+        noise (float, optional):
+                The standard deviation of the noise of the coordinates in nanometers.
+                Default: 0.01.
+        seed (int, optional):
+                The seed of the noise.
+                Default: 0.
+
+    Returns:
+        Tuple (frames of shape (n_frames, n_beads, 3), ground truth). The ground truth is a dictionary with the
+        events, the knot type and the range of the beads, on which the knot is tied.
+    """
+    frames = synthetic_frames(0, n_frames, n_beads, events, noise, seed)
+    return frames, synthetic_truth(n_beads, events)
+
+
+def synthetic_truth(n_beads, events):
+    """
+    Returns: the ground truth of the synthetic trajectory: dictionary with the events, the knot type and the range of
+             the beads, on which the knot is tied.
+    """
+    return {"events": list(events), "knot_type": "3_1", "knot_core": knotted_chain(n_beads)[1]}
+
+
+def write_synthetic_trajectory(path, n_frames, n_beads, events, noise=0.01, seed=0, chunk_size=10000):
+    """
+    Function writes the synthetic trajectory (see synthetic_trajectory) as the frame store (see convert_structure),
+    in chunks, so trajectories larger than memory can be generated.
+
+    Returns: the ground truth of the trajectory.
+    """
+    store = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n_frames, n_beads, 3))
+    for start in range(0, n_frames, chunk_size):
+        count = min(chunk_size, n_frames - start)
+        store[start:start + count] = synthetic_frames(start, count, n_beads, events, noise, seed)
+    store.flush()
+    del store
+    return synthetic_truth(n_beads, events)
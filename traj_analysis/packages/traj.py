@@ -1,9 +1,149 @@
 import math
+import numpy as np
+from collections import OrderedDict
 from packages.knotcore import *
-import os
+from packages.store import ResultStore
+from packages.parallel import FramePool
+from packages import profiler
+from packages.geometry import unknot_certified
+from packages.polynomial import KNOT_TYPES, UNKNOWN_KNOT, knot_codes
+from packages.states import KnotStates
+from packages.shard import check_shards, owned
 
 
-def search_for_the_type_change(start, end, iteration, lx, closure, max_cross, tries, loop):
+# the percentage of frames within min_gap, which need to be untied before knot formation (see construct_knotdict)
+PC_KNOTTING = 0.8
+# the percentage of frames within CHECK_LEN, which must be untied after the analyzed untie moment
+PC_UNKNOTTING = 0.5
+# the number of frames taken into account when checking whether the knot is resolved
+CHECK_LEN = 10
+
+
+class KnotTypeCache:
+    """
+    Memo of the knot types computed during the analysis of one trajectory. Results are kept under the key
+    (frame, closure, tries, max_cross), so every stage of the analysis, which asks about the same frame with the same
+    parameters, gets the result without calculating the Alexander polynomial again.
+
+    Args:
+        max_size (int, optional):
+                The maximum number of stored frames. When exceeded, the least recently used frames are dropped, which
+                keeps the memory flat on very long trajectories. None means no limit.
+                Default: None.
+        store (ResultStore, optional):
+                Persistent store, which is asked for the knot types missing in the memory, before they are
+                calculated.
+                Default: None.
+        prefilter (bool, optional):
+                If True, the cheap unknot certificate (see unknot_certified) is checked before the Alexander
+                polynomial is calculated.
+                Default: False.
+        engine (str, optional):
+                'topoly': the knot types are calculated by topoly.
+                'numpy': the knot types are calculated by the built-in engine (see knot_codes), in bulk when possible.
+                The structures not recognized by it are passed to topoly.
+                Default: 'topoly'.
+        adaptive (bool, optional):
+                If True, the random closures are stopped early, when the knot type is settled (see
+                adaptive_alexander).
+                Default: False.
+
+    The knot types of the knot timeline given to the analysis (see Traj.use_timeline) are served from its codes, they
+    are not kept in the memory once more.
+    """
+    def __init__(self, max_size=None, store=None, prefilter=False, engine='topoly', adaptive=False):
+        self.max_size = max_size
+        self.store = store
+        self.prefilter = prefilter
+        self.engine = engine
+        self.adaptive = adaptive
+        self.hits = 0
+        self.misses = 0
+        # number of the knot types, which were really calculated (not taken from the cache or the store)
+        self.evaluations = 0
+        # number of the calculated knot types, which were resolved by the unknot certificate
+        self.certified = 0
+        # number of the calculated knot types, which were resolved by the built-in engine
+        self.engine_resolved = 0
+        self._data = OrderedDict()
+        # codes of the knot types of all frames and their names (see Traj.knot_timeline)
+        self.timeline = None
+
+    def get(self, key):
+        """
+        Returns: the stored knot type or None, if the key was not calculated yet.
+        """
+        if key in self._data:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+        kn = self.timeline_knot_type(key)
+        if kn is not None:
+            self.hits += 1
+            return kn
+        self.misses += 1
+        return None
+
+    def timeline_knot_type(self, key):
+        """
+        Returns: the knot type of the frame of the key in the timeline or None, if there is no timeline, the frame is
+                 not in it or its knot type has no code (UNKNOWN_KNOT).
+        """
+        if self.timeline is None:
+            return None
+        codes, knot_types = self.timeline
+        if not -len(codes) <= key[0] < len(codes) or codes[key[0]] == UNKNOWN_KNOT:
+            return None
+        return knot_types[codes[key[0]]]
+
+    def __contains__(self, key):
+        return key in self._data or self.timeline_knot_type(key) is not None
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.max_size is not None:
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def store_methods(self, method):
+        """
+        Returns: the methods of calculation of the knot types, which are taken from the persistent store: the given
+                 method of topoly and, with the built-in engine, also its own results. The analysis with topoly does
+                 not use the results of the engine.
+        """
+        if self.engine == 'numpy':
+            return method, 'numpy'
+        return method,
+
+    def stats(self):
+        """
+        Returns: string with the hit/miss counters of the cache.
+        """
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"knot type cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {len(self)} frames " \
+               f"stored"
+
+    def prefilter_stats(self):
+        """
+        Returns: string with the fraction of the calculated knot types, which were resolved by the unknot certificate.
+        """
+        rate = self.certified / self.evaluations * 100 if self.evaluations else 0
+        return f"unknot prefilter: {self.certified} of {self.evaluations} calculated frames resolved ({rate:.1f}%)"
+
+    def engine_stats(self):
+        """
+        Returns: string with the fraction of the calculated knot types, which were resolved by the built-in engine.
+        """
+        rate = self.engine_resolved / self.evaluations * 100 if self.evaluations else 0
+        return f"numpy engine: {self.engine_resolved} of {self.evaluations} calculated frames resolved ({rate:.1f}%)"
+
+
+def search_for_the_type_change(start, end, iteration, lx, closure, max_cross, tries, loop, cache=None):
     """
     Function iterates every specified step, searching for the moments when the type of knot in the trajectory changes.
 
@@ -16,6 +156,8 @@ def search_for_the_type_change(start, end, iteration, lx, closure, max_cross, tr
                 Step every which we perform a trajectory search.
         loop (bool):
                 True if looking for looping moment.
+        cache (KnotTypeCache, optional):
+                Memo of already calculated knot types.
 
     Returns: list of frames, in which a knot type change was detected
     """
@@ -26,7 +168,7 @@ def search_for_the_type_change(start, end, iteration, lx, closure, max_cross, tr
         knot = " "
 
     for i in range(start, end, iteration):
-        kn = knot_type(i, lx, closure, max_cross, tries)
+        kn = knot_type(i, lx, closure, max_cross, tries, cache)
 
         if loop and str(kn) != knot and str(kn) != '0_1':
             frame_list.append(i)
@@ -43,18 +185,73 @@ def search_for_the_type_change(start, end, iteration, lx, closure, max_cross, tr
     return frame_list
 
 
-def knot_type(i, lx, closure, max_cross, tries):
+def knot_type(i, lx, closure, max_cross, tries, cache=None):
     """
-    Function calculates the Alexander polynomial of the given structure.
+    Function calculates the Alexander polynomial of the given structure. If the cache is given, the result is looked
+    up there first (and in its persistent store) and stored there after the calculation.
+
+    Returns: topology type.
+    """
+    profiler.count("knot_type")
+    if cache is not None:
+        key = (i, closure, tries, max_cross)
+        kn = cache.get(key)
+        if kn is None:
+            method = knot_type_method(closure, cache.adaptive)
+            if cache.store is not None:
+                kn = cache.store.get_knot_type(lx[i], closure, tries, max_cross, cache.store_methods(method))
+            if kn is None and cache.engine == 'numpy':
+                code = knot_codes(lx[i][None, ::2], closure)[0]
+                if code != UNKNOWN_KNOT:
+                    kn = KNOT_TYPES[code]
+                    cache.engine_resolved += 1
+                    cache.evaluations += 1
+                    if cache.store is not None:
+                        cache.store.put_knot_type(lx[i], closure, tries, max_cross, kn, 'numpy')
+            if kn is None:
+                if cache.prefilter:
+                    kn, certified = prefiltered_knot_type(lx[i], closure, max_cross, tries, cache.adaptive)
+                    cache.certified += certified
+                else:
+                    kn = chain_knot_type(lx[i], closure, max_cross, tries, cache.adaptive)
+                cache.evaluations += 1
+                if cache.store is not None:
+                    cache.store.put_knot_type(lx[i], closure, tries, max_cross, kn, method)
+            cache.put(key, kn)
+        return kn
+
+    return chain_knot_type(lx[i], closure, max_cross, tries)
+
+
+def knot_type_method(closure, adaptive):
+    """
+    Returns: the name of the method of calculating the knot types, under which they are kept in the persistent store.
+             The random closures stopped early (adaptive) can give other results than all tries closures, so they are
+             kept separately.
+    """
+    if adaptive and closure != 1:
+        return 'topoly-adaptive'
+    return 'topoly'
+
+
+def chain_knot_type(chain, closure, max_cross, tries, adaptive=False):
+    """
+    Function calculates the Alexander polynomial of the structure given by its coordinates. Every second atom is taken
+    into account. It is the part of knot_type, which can be run in the worker processes. In the adaptive mode, the
+    random closures stop, when the leading knot type is statistically separated from the runner-up (then it is surely
+    the most probable one), otherwise all tries closures are run.
 
     Returns: topology type.
     """
     if closure == 1:
-        return alexander([[x, y, z] for x, y, z in lx[i][::2]], closure=closure, run_parallel=False,
-                         max_cross=max_cross)
+        return call_alexander([[x, y, z] for x, y, z in chain[::2]], closure=closure, run_parallel=False,
+                              max_cross=max_cross)
     else:
-        res = alexander([[x, y, z] for x, y, z in lx[i][::2]], closure=closure, tries=tries, run_parallel=False,
-                        max_cross=max_cross)
+        if adaptive:
+            res = adaptive_alexander([[x, y, z] for x, y, z in chain[::2]], closure, tries, max_cross)
+        else:
+            res = call_alexander([[x, y, z] for x, y, z in chain[::2]], closure=closure, tries=tries,
+                                 run_parallel=False, max_cross=max_cross)
         max_value = max(res.values())
         max_keys = [key for key, value in res.items() if value == max_value]
         if len(max_keys) > 1:
@@ -63,66 +260,126 @@ def knot_type(i, lx, closure, max_cross, tries):
             return max_keys[0]
 
 
-def knotcore_len(i, lx, closure, tries, max_cross):
+def prefiltered_knot_type(chain, closure, max_cross, tries, adaptive=False):
     """
-    Function creates a nxyz file and calculates knot core value in the given frame.
+    Function checks the cheap unknot certificate of the chain (on the same atoms as chain_knot_type) and calculates
+    the Alexander polynomial only if the certificate can not decide. Most frames of a folding trajectory are plainly
+    unknotted, and for them the polynomial is skipped.
+
+    Returns: tuple (topology type, True if it was resolved by the certificate).
+    """
+    if unknot_certified(chain[::2], closure):
+        return '0_1', True
+    return chain_knot_type(chain, closure, max_cross, tries, adaptive), False
+
+
+def knotcore_len(i, lx, closure, tries, max_cross, store=None, search='linear', hint=None, adaptive=False):
+    """
+    Function calculates knot core value in the given frame. The coordinates are passed to topoly directly, without
+    any temporary file. If the persistent store is given, the value is read from it when possible and saved there
+    after the calculation. The search argument selects the boundary search of find_knotcore_simple, the hint is the
+    knot core range of a neighbouring frame, from which the search starts. In the adaptive mode, the random closures
+    stop early (see adaptive_alexander).
 
     Returns: knot core value
              None, if the knot core function returns invalid value.
     """
+    profiler.count("knotcore_len")
+    if store is not None:
+        label = knotcore_label(search, hint is not None, closure, adaptive)
+        found, knotcore_res = store.get_knotcore(lx[i], closure, tries, max_cross, label)
+        if not found:
+            knotcore_res = chain_knotcore(lx[i], closure, tries, max_cross, search, hint, adaptive)
+            store.put_knotcore(lx[i], closure, tries, max_cross, knotcore_res, label)
+        return knotcore_res
+
+    return chain_knotcore(lx[i], closure, tries, max_cross, search, hint, adaptive)
+
+
+def knotcore_label(search, hinted, closure=1, adaptive=False):
+    """
+    Returns: the name of the knot core method, under which the results are kept in the persistent store. The results
+             of the adaptive random closures are kept separately (see knot_type_method).
+    """
+    if hinted:
+        search += '-warm'
+    if adaptive and closure != 1:
+        search += '-adaptive'
+    return search
 
-    j = 0
-    # creating nxyz file
-    with open("frames_temp.nxyz", "a") as output:
-        for line in lx[i]:
-            output.write(str(j))
-            output.write(' ')
-            for x in line:
-                output.write(' ')
-                output.write(str(x))
-            output.write('\n')
-            j += 1
-    output.close()
 
+def chain_knotcore_series(chains, closure, tries, max_cross, search='linear', adaptive=False):
+    """
+    Function calculates knot core values of the consecutive structures (e.g. successive frames of the trajectory).
+    The search in every structure starts from the knot core range of the previous one.
+
+    Returns: list of tuples (knot core value, True if the search started from the previous knot core range).
+    """
+    knotcores = []
+    hint = None
+    for chain in chains:
+        knotcore = chain_knotcore(chain, closure, tries, max_cross, search, hint, adaptive)
+        knotcores.append((knotcore, hint is not None))
+        if type(knotcore) is tuple:
+            hint = knotcore
+    return knotcores
+
+
+def chain_knotcore(chain, closure, tries, max_cross, search='linear', hint=None, adaptive=False):
+    """
+    Function calculates knot core value of the structure given by its coordinates. It is the part of knotcore_len,
+    which can be run in the worker processes.
+
+    Returns: knot core value
+             None, if the knot core function returns invalid value.
+    """
     # calculate knot core
-    knotcore_res = count_knotcore('frames_temp.nxyz', closure=closure, tries=tries, max_cross=max_cross)
+    knotcore_res = count_knotcore(chain, closure=closure, tries=tries, max_cross=max_cross, search=search, hint=hint,
+                                  adaptive=adaptive)
     if knotcore_res is None:
         knotcore_res = 0
     else:
         if knotcore_res[1] - knotcore_res[0] == 0:
             knotcore_res = None
 
-    os.remove("frames_temp.nxyz")
-
     return knotcore_res
 
 
-def check_after_knotting(start, end, lx, closure, max_cross, tries):
+def check_after_knotting(start, end, lx, closure, max_cross, tries, cache=None, states=None):
     """
-    Function checks if knot is tied on the correct number of frames.
+    Function checks if knot is tied on the correct number of frames. If the states of the frames are given (see
+    KnotStates), the first unknotted frame is read from them in O(1).
 
     Returns: 1 if knotted correctly,
             frame, in which the unknot is found otherwise.
     """
+    if states is not None and states.covers(start, end):
+        frame = states.first_unknotted(start, end)
+        return frame if frame is not None else 1
+
     for i in range(start, end):
-        kn = knot_type(i, lx, closure, max_cross, tries)
+        kn = knot_type(i, lx, closure, max_cross, tries, cache)
         if kn == '0_1':
             return i
     return 1
 
 
-def check_knotting(start, end, pc, lx, min_gap, closure, max_cross, tries):
+def check_knotting(start, end, pc, lx, min_gap, closure, max_cross, tries, cache=None, states=None):
     """
     Function checks if knot is not tied on the given percentage (pc) of min_gap frames. It can be used to check, if
     there were enough frames without a knot before the moment of knotting. Or to check, if the knot was really
-    unknotted, or the unknot frames appeared by chance after the consider moment of unknotting.
+    unknotted, or the unknot frames appeared by chance after the consider moment of unknotting. If the states of the
+    frames are given (see KnotStates), the knotted frames are counted in O(1).
 
     Returns: True if not knotted, False otherwise.
     """
     case = math.floor((1-pc) * min_gap)
+    if states is not None and states.covers(start, end):
+        # the frames are walked until the (case + 2)-th knotted one
+        return states.knotted_count(start, end) < case + 2
 
     for i in range(start, end):
-        kn = knot_type(i, lx, closure, max_cross, tries)
+        kn = knot_type(i, lx, closure, max_cross, tries, cache)
         if kn != '0_1' and case < 0:
             return False
         if kn != '0_1':
@@ -130,9 +387,31 @@ def check_knotting(start, end, pc, lx, min_gap, closure, max_cross, tries):
     return True
 
 
+def check_unknotting(start, stop, step, pc, lx, min_gap, closure, max_cross, tries, cache=None, states=None):
+    """
+    Function checks the windows of min_gap frames starting every step frames from start (as long as the window ends
+    before stop), if in any of them the knot is not tied on the given percentage (pc) of frames (see check_knotting).
+    If the states of the frames are given (see KnotStates), all windows are checked at once.
+
+    Returns: True if the knot is not tied in one of the windows, False otherwise.
+    """
+    if states is not None and states.covers(min(start, stop), stop):
+        starts = np.arange(start, stop - min_gap, step)
+        return bool(np.any(states.knotted_counts(starts, min_gap) < math.floor((1-pc) * min_gap) + 2))
+
+    next_frame = start
+    while next_frame + min_gap < stop:
+        if check_knotting(next_frame, next_frame + min_gap, pc, lx, min_gap, closure, max_cross, tries, cache):
+            return True
+        next_frame += step
+    return False
+
+
 class Traj:
     def __init__(self, lx, prot_len, max_frame, min_gap, scope, min_knot, nterminus, nat_knotcore, closure, tries,
-                 max_cross, debug):
+                 max_cross, debug, cache_size=None, store=None, workers=1, knotcore_search='linear',
+                 warm_start=False, search_mode='fixed', search_stride=None, prefilter=False, knot_engine='topoly',
+                 checkpoint=None, adaptive=False):
         self.lx = lx
         self.prot_len = prot_len
         # maximum tail length for slipknot classification, 2 thresholds for small (below 100 nucleotides) and
@@ -150,10 +429,43 @@ class Traj:
         self.closure = closure
         self.tries = tries
         self.max_cross = max_cross
+        self.knotcore_search = knotcore_search
+        # knot core search in a frame starts from the knot core range of the previous frame
+        self.warm_start = warm_start
+        # method of searching the moments of knotting and unknotting, see searched_structure
+        self.search_mode = search_mode
+        self.search_stride = search_stride
+        self.search_evaluations = 0
         self.debug = debug
+        # knot types are shared by all stages of the analysis, the store keeps them (and knot cores) between runs
+        self.store = store
+        if knot_engine == 'numpy' and closure != 1:
+            raise ValueError("The built-in engine of the knot types supports only the closure 1.")
+        if search_mode not in ('fixed', 'bisect'):
+            raise ValueError(f"Unknown search mode '{search_mode}', expected 'fixed' or 'bisect'.")
+        # the random closures are stopped early, when the knot type is settled
+        self.adaptive = adaptive
+        self.cache = KnotTypeCache(cache_size, store, prefilter, knot_engine, adaptive)
+        # independent frames (scan points, knot core samples) are evaluated in the pool
+        self.pool = FramePool(workers)
         self.frame_list = []
         self.knot_dict = {}
         self.untied_list = []
+        # knotted/unknotted states of all frames (see use_timeline), which speed up the checks of construct_knotdict
+        self.states = None
+        # frames searched for the moments of knotting and unknotting, None means the whole trajectory (see
+        # analyze_shard)
+        self.search_range = None
+        # results of the checks of the possible moments of knotting and unknotting (see construct_knotdict), also
+        # calculated by the shards of the analysis
+        self.knotting_results = {}
+        self.unknotting_results = {}
+        # the state of the analysis is saved after every stage and during the long stages, see Checkpoint
+        self.checkpoint = checkpoint
+        self.completed_stages = []
+        # knot cores of the processed knotting frames (calculate_knotcore) and of the series sampled for the plot
+        self.knotcore_results = {}
+        self.series_results = {}
 
     def calculate(self, full_output):
         """
@@ -169,16 +481,19 @@ class Traj:
         Returns:
             Dictionary with the results of the analysis.
         """
-        self.frame_list = self.searched_structure(True)
-        self.untied_list = self.searched_structure(False)
-        self.check_untied_list()
+        self.load_checkpoint()
+        self.run_stage("searched_structure", self.search_knotting)
+        self.run_stage("check_untied_list", self.check_untied_list)
         if self.debug:
             print("Result of first iteration of searching for the possible moments of knotting: ", self.frame_list)
+            print("Number of knot type calculations in the search: ", self.search_evaluations)
         if len(self.frame_list) != 0:
-            self.knot_dict = self.construct_knotdict()
-            self.check_knot()
-            self.calculate_knotcore()
-            self.specify_knotting_style()
+            self.run_stage("construct_knotdict", self.update_knotdict)
+            self.run_stage("check_knot", self.check_knot)
+            self.run_stage("calculate_knotcore", self.calculate_knotcore)
+            self.run_stage("specify_knotting_style", self.specify_knotting_style)
+            if self.debug:
+                self.print_cache_stats()
 
             if full_output:
                 full_knot_dict = {}
@@ -205,8 +520,375 @@ class Traj:
             else:
                 return self.knot_dict
         else:
+            if self.debug:
+                self.print_cache_stats()
             return None
 
+    def search_knotting(self):
+        """
+        Function searches the possible moments of knotting and unknotting (the first stage of calculate).
+        """
+        evaluations = self.cache.evaluations
+        self.frame_list = self.searched_structure(True)
+        self.untied_list = self.searched_structure(False)
+        self.search_evaluations = self.cache.evaluations - evaluations
+
+    def update_knotdict(self):
+        self.knot_dict = self.construct_knotdict()
+
+    def run_stage(self, name, stage):
+        """
+        Function runs the stage of the analysis, unless it was completed before the resumed checkpoint, and saves the
+        checkpoint after it.
+        """
+        if name in self.completed_stages:
+            return
+        with profiler.stage(name):
+            stage()
+        self.completed_stages.append(name)
+        self.save_checkpoint()
+
+    def checkpoint_params(self):
+        """
+        Returns: the parameters of the analysis, which must be the same to resume the saved state.
+        """
+        return {"frames": len(self.lx), "first_frame": ResultStore.frame_hash(np.asarray(self.lx[0])),
+                "last_frame": ResultStore.frame_hash(np.asarray(self.lx[-1])), "prot_len": self.prot_len,
+                "min_gap": self.min_gap, "scope": self.scope, "min_knot": self.min_knot, "nterminus": self.nterminus,
+                "nat_knotcore": self.nat_knotcore, "closure": self.closure, "tries": self.tries,
+                "max_cross": self.max_cross, "knotcore_search": self.knotcore_search, "warm_start": self.warm_start,
+                "search_mode": self.search_mode, "search_stride": self.search_stride, "knot_engine": self.cache.engine,
+                "adaptive": self.adaptive}
+
+    def timeline_params(self, stride=1):
+        """
+        Returns: the parameters of the knot timeline (see knot_timeline), which must be the same to use the saved one.
+        """
+        params = self.checkpoint_params()
+        return dict({key: params[key] for key in ("frames", "first_frame", "last_frame", "closure", "tries",
+                                                  "max_cross", "knot_engine", "adaptive")}, stride=stride)
+
+    def load_checkpoint(self):
+        """
+        Function restores the state of the analysis saved in the checkpoint (if it is resumed).
+        """
+        if self.checkpoint is None:
+            return
+        state = self.checkpoint.load(self.checkpoint_params())
+        if state is not None:
+            for name, value in state.items():
+                setattr(self, name, value)
+            if self.debug:
+                print("Resuming the analysis after the stages: ", self.completed_stages)
+
+    def save_checkpoint(self, force=True):
+        """
+        Function saves the state of the analysis in the checkpoint. The progress inside the stages is saved with
+        force=False, so it is written at most once per the interval of the checkpoint.
+        """
+        if self.checkpoint is None:
+            return
+        self.checkpoint.save(self.checkpoint_params(), {
+            "completed_stages": self.completed_stages, "frame_list": self.frame_list,
+            "untied_list": self.untied_list, "knot_dict": self.knot_dict, "search_evaluations": self.search_evaluations,
+            "knotcore_results": self.knotcore_results, "series_results": self.series_results})
+
+    def analyze_shard(self, start, end, halo=None):
+        """
+        Function analyzes the shard of the trajectory: the frames range(start, end), so the long trajectory can be
+        analyzed by many processes (or machines) and the results merged by merge_shards. The possible moments of
+        knotting and unknotting are searched in the shard and in the halo of frames around it, but the shard keeps only
+        the ones detected by the coarse search in its own frames, so every moment belongs to exactly one shard. Then
+        it checks them (see knotting_result and unknotting_result) and calculates the knot types and the knot cores of
+        the found knotting frames. The moments found in the halo are used to check, if the neighbouring shards agree.
+
+        Args:
+            start (int):
+                    The first frame of the shard.
+            end (int):
+                    The frame after the last frame of the shard.
+            halo (int, optional):
+                    The number of extra frames searched on both sides of the shard, at least min_gap + scope +
+                    min_knot. None means the minimal halo.
+                    Default: None.
+
+        Returns: dictionary with the results of the shard (see merge_shards), which can be saved by save_shard.
+        """
+        min_halo = self.min_gap + self.scope + self.min_knot
+        if halo is None:
+            halo = min_halo
+        elif halo < min_halo:
+            raise ValueError(f"The halo must be at least min_gap + scope + min_knot = {min_halo} frames.")
+        if not 0 <= start < end <= len(self.lx):
+            raise ValueError(f"The shard [{start}, {end}) is not in the trajectory of {len(self.lx)} frames.")
+
+        evaluations = self.cache.evaluations
+        self.search_range = (start - halo, end + halo)
+        knotting = self.search_candidates(True)
+        unknotting = self.search_candidates(False)
+        evaluations = self.cache.evaluations - evaluations
+        # the first frame of the coarse search has no previous frame, the changes detected in it are not reliable
+        first, last = self.grid_range(100 if self.search_mode == 'fixed' else self.coarse_stride())
+        searched = (0 if first == 0 else first + 1, last)
+        knotting = [pair for pair in knotting if searched[0] <= pair[0]]
+        unknotting = [pair for pair in unknotting if searched[0] <= pair[0]]
+
+        knotting_frames = [frame for checked, frame in knotting if start <= checked < end]
+        if start == 0:
+            # the knot tied from the beginning of the trajectory (see check_untied_list)
+            knotting_frames.insert(0, 0)
+        # the checks going past the end of the trajectory are not memoized, the merged analysis repeats them (and
+        # fails like the analysis of the whole trajectory), only if it needs them
+        knot_types = {}
+        for frame in knotting_frames:
+            try:
+                knotting_frame = self.knotting_result(frame)
+            except IndexError:
+                continue
+            if knotting_frame is not None and knotting_frame not in knot_types:
+                knot_types[knotting_frame] = knot_type(knotting_frame, self.lx, self.closure, self.max_cross,
+                                                       self.tries, self.cache)
+                self.knotcore_results[knotting_frame] = self.valid_knotcore(knotting_frame)
+        for un_frame in [frame for checked, frame in unknotting if start <= checked < end]:
+            try:
+                self.unknotting_result(un_frame)
+            except IndexError:
+                continue
+
+        return {"start": start, "end": end, "halo": halo, "searched": searched, "params": self.checkpoint_params(),
+                "knotting": knotting, "unknotting": unknotting, "knotting_results": self.knotting_results,
+                "unknotting_results": self.unknotting_results, "knot_types": knot_types,
+                "knotcore_results": self.knotcore_results, "search_evaluations": evaluations}
+
+    def merge_shards(self, shards):
+        """
+        Function merges the results of the shards (see analyze_shard), which cover the whole trajectory. The possible
+        moments of knotting and unknotting of the shards are joined in the order of the frames, and the results of
+        their checks, knot types and knot cores are used by the following stages of calculate, so the merged analysis
+        gives the same knot_dict as the analysis of the whole trajectory in one process.
+
+        The shards must be calculated with the same parameters as this analysis, and the neighbouring shards must
+        find the same moments of knotting and unknotting in the overlapping frames, otherwise ValueError is raised.
+        """
+        shards = check_shards(shards, self.checkpoint_params())
+        self.frame_list = [frame for shard in shards for frame in owned(shard["knotting"], shard)]
+        self.untied_list = [frame for shard in shards for frame in owned(shard["unknotting"], shard)]
+        for shard in shards:
+            self.knotting_results.update(shard["knotting_results"])
+            self.unknotting_results.update(shard["unknotting_results"])
+            self.knotcore_results.update(shard["knotcore_results"])
+            for frame, kn in shard["knot_types"].items():
+                self.cache.put((frame, self.closure, self.tries, self.max_cross), kn)
+        self.search_evaluations = sum(shard["search_evaluations"] for shard in shards)
+        self.completed_stages = ["searched_structure"]
+
+    def print_cache_stats(self):
+        """
+        Function prints the counters of the knot type cache and of the persistent store (debug mode).
+        """
+        print(self.cache.stats())
+        if self.cache.prefilter:
+            print(self.cache.prefilter_stats())
+        if self.cache.engine == 'numpy':
+            print(self.cache.engine_stats())
+        if self.store is not None:
+            print(self.store.stats())
+
+    def prefetch_knot_types(self, frames):
+        """
+        Function calculates in the pool the knot types of the given frames, which are not known yet, and puts them
+        into the cache. The following searches take the results from the cache, so they are the same as in the serial
+        analysis. With the built-in engine, the knot types of all the frames are first calculated at once, only the
+        frames not recognized by it are passed to the pool. Nothing is done, if the analysis runs on one worker with
+        topoly.
+        """
+        if self.pool.workers <= 1 and self.cache.engine != 'numpy':
+            return
+        missing = []
+        for i in dict.fromkeys(frames):
+            key = (i, self.closure, self.tries, self.max_cross)
+            if key in self.cache:
+                continue
+            if self.store is not None:
+                kn = self.store.get_knot_type(self.lx[i], self.closure, self.tries, self.max_cross,
+                                              self.cache.store_methods(knot_type_method(self.closure, self.adaptive)))
+                if kn is not None:
+                    self.cache.put(key, kn)
+                    continue
+            missing.append(i)
+        profiler.count("knot_type (prefetched)", len(missing))
+
+        if self.cache.engine == 'numpy' and len(missing) > 0:
+            codes = knot_codes(np.stack([self.lx[i][::2] for i in missing]), self.closure)
+            self.put_knot_types([(i, KNOT_TYPES[code]) for i, code in zip(missing, codes) if code != UNKNOWN_KNOT],
+                                'numpy')
+            self.cache.engine_resolved += int(np.count_nonzero(codes != UNKNOWN_KNOT))
+            missing = [i for i, code in zip(missing, codes) if code == UNKNOWN_KNOT]
+        if self.pool.workers <= 1:
+            return
+
+        func = prefiltered_knot_type if self.cache.prefilter else chain_knot_type
+        results = self.pool.map(func, [self.lx[i] for i in missing], closure=self.closure, max_cross=self.max_cross,
+                                tries=self.tries, adaptive=self.adaptive)
+        if self.cache.prefilter:
+            self.cache.certified += sum(certified for _, certified in results)
+            results = [kn for kn, _ in results]
+        self.put_knot_types(zip(missing, results))
+
+    def use_timeline(self, codes, knot_types, params=None):
+        """
+        Function gives the analysis the knot timeline of all frames (see knot_timeline), so the checks of the windows
+        of frames in construct_knotdict are answered from its index (KnotStates), instead of walking the frames, and
+        the knot types of the frames are taken from it by the other stages. The parameters of the saved timeline (see
+        timeline_params) must be the same as the ones of the analysis.
+        """
+        if params is not None and params.get("stride", 1) != 1:
+            raise ValueError(f"The timeline was calculated for every {params['stride']}-th frame, the analysis needs "
+                             f"the timeline of every frame (stride 1).")
+        if params is not None and params != self.timeline_params():
+            raise ValueError("The timeline was calculated for another trajectory or with different parameters of the "
+                             "knot types, it can not be used.")
+        if len(codes) != len(self.lx):
+            raise ValueError(f"The timeline has {len(codes)} frames, the trajectory has {len(self.lx)} frames.")
+        self.states = KnotStates.from_timeline(codes, knot_types)
+        self.cache.timeline = (np.asarray(codes), tuple(knot_types))
+
+    def knot_timeline(self, stride=1, chunk_size=10000):
+        """
+        Function calculates the knot type of every stride-th frame of the trajectory. The frames are processed in
+        chunks: the knot types of a chunk are calculated at once in the pool (see prefetch_knot_types) and then read by
+        knot_type, so they are also kept in the cache and in the persistent store for the following analyses.
+
+        Args:
+            stride (int, optional):
+                    Every stride-th frame is calculated.
+                    Default: 1.
+            chunk_size (int, optional):
+                    The number of frames calculated at once, it is limited by the size of the cache.
+                    The cache keeps the knot types of at most one chunk, while the timeline is calculated.
+                    Default: 10000.
+
+        Returns:
+            Tuple (codes, knot types). The codes are the uint8 array with the code of the knot type of every
+            calculated frame, the knot types are the names of the codes (the code is the index in the tuple). It
+            starts with KNOT_TYPES, the other knot types found are appended, UNKNOWN_KNOT is used, when there are too
+            many of them.
+        """
+        frames = range(0, len(self.lx), stride)
+        max_size = self.cache.max_size
+        if max_size is not None:
+            chunk_size = min(chunk_size, max_size)
+        codes = np.empty(len(frames), dtype=np.uint8)
+        table = list(KNOT_TYPES)
+        code_of = {kn: code for code, kn in enumerate(table)}
+        # only the knot types of one chunk are kept in the memory, the timeline itself keeps one byte per frame
+        self.cache.max_size = chunk_size
+        try:
+            for start in range(0, len(frames), chunk_size):
+                chunk = frames[start:start + chunk_size]
+                self.prefetch_knot_types(chunk)
+                for k, i in enumerate(chunk, start):
+                    kn = knot_type(i, self.lx, self.closure, self.max_cross, self.tries, self.cache)
+                    if kn not in code_of and len(table) < UNKNOWN_KNOT:
+                        code_of[kn] = len(table)
+                        table.append(kn)
+                    codes[k] = code_of.get(kn, UNKNOWN_KNOT)
+        finally:
+            self.cache.max_size = max_size
+        return codes, tuple(table)
+
+    def put_knot_types(self, results, method=None):
+        """
+        Function puts the calculated knot types (pairs frame, knot type) into the cache and the persistent store, where
+        they are kept under the method of their calculation (by default topoly, see knot_type_method).
+        """
+        if method is None:
+            method = knot_type_method(self.closure, self.adaptive)
+        for i, kn in results:
+            self.cache.evaluations += 1
+            self.cache.put((i, self.closure, self.tries, self.max_cross), kn)
+            if self.store is not None:
+                self.store.put_knot_type(self.lx[i], self.closure, self.tries, self.max_cross, kn, method)
+
+    def knotcore_series(self, series):
+        """
+        Function calculates the knot core values in the given series of frames (see _knotcore_series). If the
+        checkpoint is used, the series are calculated one by one and the state is saved after them (at most once per
+        the interval of the checkpoint), so the resumed analysis does not calculate them again.
+
+        Returns: list of lists of knot core values (as returned by knotcore_len) in the order of the frames.
+        """
+        if self.checkpoint is None:
+            return self._knotcore_series(series)
+        for frames in series:
+            if tuple(frames) not in self.series_results:
+                self.series_results[tuple(frames)] = self._knotcore_series([frames])[0]
+                self.save_checkpoint(force=False)
+        return [self.series_results[tuple(frames)] for frames in series]
+
+    def _knotcore_series(self, series):
+        """
+        Function calculates in the pool the knot core values in the given series of frames. Values found in the
+        persistent store are not calculated again. If the warm start is enabled, the search in every frame starts from
+        the knot core range of the previous frame of its series. The series are then split into as many parts as
+        needed to keep all workers busy.
+
+        Args:
+            series (list of lists of int):
+                    Frames, in which the knot core is calculated, e.g. the frames sampled after one knotting event.
+
+        Returns: list of lists of knot core values (as returned by knotcore_len) in the order of the frames.
+        """
+        # with the warm start, the first frames of the parts are calculated without the hint and stored under the
+        # plain label, the other frames under the warm label
+        labels = [knotcore_label(self.knotcore_search, hinted, self.closure, self.adaptive)
+                  for hinted in dict.fromkeys([self.warm_start, False])]
+        knotcores = {}
+        queued = set()
+        parts = []
+        for frames in series:
+            missing = []
+            for i in frames:
+                if i in knotcores or i in queued:
+                    continue
+                if self.store is not None:
+                    for label in labels:
+                        found, knotcore = self.store.get_knotcore(self.lx[i], self.closure, self.tries,
+                                                                  self.max_cross, label)
+                        if found:
+                            knotcores[i] = knotcore
+                            break
+                    if found:
+                        continue
+                missing.append(i)
+                queued.add(i)
+            parts.append(missing)
+        profiler.count("knotcore_len (series)", sum(len(part) for part in parts))
+
+        if self.warm_start:
+            if self.pool.workers > 1:
+                part_len = max(11, math.ceil(sum(len(part) for part in parts) / (self.pool.workers * 4)))
+                parts = [part[j:j + part_len] for part in parts for j in range(0, len(part), part_len)]
+            parts = [part for part in parts if len(part) > 0]
+            results = self.pool.map(chain_knotcore_series, [[self.lx[i] for i in part] for part in parts],
+                                    closure=self.closure, tries=self.tries, max_cross=self.max_cross,
+                                    search=self.knotcore_search, adaptive=self.adaptive)
+            missing = [i for part in parts for i in part]
+            results = [result for part_results in results for result in part_results]
+        else:
+            missing = [i for part in parts for i in part]
+            results = self.pool.map(chain_knotcore, [self.lx[i] for i in missing], closure=self.closure,
+                                    tries=self.tries, max_cross=self.max_cross, search=self.knotcore_search,
+                                    adaptive=self.adaptive)
+            results = [(knotcore, False) for knotcore in results]
+
+        for i, (knotcore, hinted) in zip(missing, results):
+            knotcores[i] = knotcore
+            if self.store is not None:
+                self.store.put_knotcore(self.lx[i], self.closure, self.tries, self.max_cross, knotcore,
+                                        knotcore_label(self.knotcore_search, hinted, self.closure, self.adaptive))
+        return [[knotcores[i] for i in frames] for frames in series]
+
     def searched_structure(self, knotting):
         """
         Function searches the trajectory to find the moment of change from unknot to knot or from knot to unknot.
@@ -221,17 +903,34 @@ class Traj:
                     True, if looking dor the moments of knotting.
                     False, if looking for thr moments of unknotting.
 
+        If search_mode is 'bisect', the search is done by the bisection_search function instead.
+
         Returns: list of frames, where the knot is likely to have tied or untied.
         """
-        # searching every 100 frames
-        frame_list_100 = search_for_the_type_change(0, len(self.lx), 100, self.lx, self.closure, self.max_cross,
-                                                    self.tries, knotting)
+        return [frame for _, frame in self.search_candidates(knotting)]
+
+    def search_candidates(self, knotting):
+        """
+        Function searches the moments of knotting or unknotting like searched_structure. Only the frames of the
+        search_range are searched (see analyze_shard).
+
+        Returns: list of pairs (frame of the coarse search, in which the change was detected, the found frame).
+        """
+        if self.search_mode == 'bisect':
+            return self.bisection_search(knotting)
+
+        # searching every 100 frames, the evaluated frames are shared by the knotting and unknotting searches
+        first, last = self.grid_range(100)
+        self.prefetch_knot_types(range(first, last, 100))
+        frame_list_100 = search_for_the_type_change(first, last, 100, self.lx, self.closure, self.max_cross,
+                                                    self.tries, knotting, self.cache)
 
         # searching every 10 frames
         frame_list_10 = []
+        self.prefetch_knot_types([i for frame in frame_list_100 for i in range(frame - 90, frame - 10, 10)])
         for j in range(len(frame_list_100)):
             frame = search_for_the_type_change(frame_list_100[j] - 90, frame_list_100[j]-10, 10, self.lx,
-                                               self.closure, self.max_cross, self.tries, knotting)
+                                               self.closure, self.max_cross, self.tries, knotting, self.cache)
             if len(frame) == 0:
                 frame_list_10.append(frame_list_100[j])
             else:
@@ -239,15 +938,86 @@ class Traj:
 
         # searching every 1 frame
         frame_list_1 = []
+        self.prefetch_knot_types([i for frame in frame_list_10 for i in range(frame - 9, frame - 1)])
         for j in range(len(frame_list_10)):
             frame = search_for_the_type_change(frame_list_10[j] - 9, frame_list_10[j]-1, 1, self.lx,
-                                               self.closure, self.max_cross, self.tries, knotting)
+                                               self.closure, self.max_cross, self.tries, knotting, self.cache)
             if len(frame) == 0:
                 frame_list_1.append(frame_list_10[j])
             else:
                 frame_list_1.append(frame[0])
 
-        return frame_list_1
+        return list(zip(frame_list_100, frame_list_1))
+
+    def grid_range(self, stride):
+        """
+        Function chooses the frames of the coarse search (every stride frames from frame 0) in the search_range. The
+        search starts one stride before the range, so the knot type changes in the range are detected as in the whole
+        trajectory (the first checked frame has no previous one).
+
+        Returns: tuple (first, end) of the checked frames.
+        """
+        if self.search_range is None:
+            return 0, len(self.lx)
+        first, last = self.search_range
+        return max(0, (max(first, 0) // stride - 1) * stride), min(last, len(self.lx))
+
+    def coarse_stride(self):
+        """
+        Returns: the stride of the coarse search of the bisection_search: search_stride if given, otherwise chosen
+                 from the length of the trajectory (1/200 of it, at least 10), but not greater than min_knot, so the
+                 knots, which are long enough to be kept in the analysis, are not skipped.
+        """
+        if self.search_stride is not None:
+            return self.search_stride
+        return max(10, min(self.min_knot, len(self.lx) // 200))
+
+    def bisection_search(self, knotting):
+        """
+        Function searches the trajectory to find the moments of change from unknot to knot or from knot to unknot,
+        like searched_structure, but with the configurable coarse stride and bisection. First, it checks every
+        coarse_stride frames (in the pool), then every change of the knot type between two checked frames is located
+        by bisection: with about log2(stride) knot type calculations instead of up to 18 in the searches every 10 and
+        every 1 frame. Like the original search, it ignores the knots, which exist for less than the stride.
+
+        Args:
+            knotting (bool):
+                    True, if looking for the moments of knotting.
+                    False, if looking for the moments of unknotting.
+
+        Returns: list of pairs (frame of the coarse search, in which the change was detected, the found frame).
+        """
+        stride = self.coarse_stride()
+        first, last = self.grid_range(stride)
+        self.prefetch_knot_types(range(first, last, stride))
+
+        def kn(i):
+            return str(knot_type(i, self.lx, self.closure, self.max_cross, self.tries, self.cache))
+
+        frame_list = []
+        previous = '0_1' if knotting else ' '
+        for i in range(first, last, stride):
+            act = kn(i)
+            if knotting:
+                change = act != previous and act != '0_1'
+            else:
+                change = act != previous and act == '0_1' and i != 0
+            if change:
+                if i == 0:
+                    frame_list.append((i, i))
+                else:
+                    # the first frame of the new knot type is between the previous checked frame and this one
+                    same, other = i - stride, i
+                    while other - same > 1:
+                        middle = (same + other) // 2
+                        if kn(middle) == previous:
+                            same = middle
+                        else:
+                            other = middle
+                    frame_list.append((i, other))
+            previous = act
+
+        return frame_list
 
     def check_untied_list(self):
         """
@@ -304,48 +1074,16 @@ class Traj:
         """
         knot_dict = {}
         auxiliary_list = []
-        PC_KNOTTING = 0.8
-        PC_UNKNOTTING = 0.5
-        CHECK_LEN = 10
         for frame_index, frame in enumerate(self.frame_list):
-            found = False
-            # check if there was no knot before the found frame
-            if check_knotting(frame - self.min_gap, frame - 1, PC_KNOTTING, self.lx, self.min_gap, self.closure,
-                              self.max_cross, self.tries):
-                # check if knot is tied on the correct number of frames
-                result = check_after_knotting(frame + 1, frame + self.scope, self.lx, self.closure, self.max_cross,
-                                              self.tries)
-                if result == 1:
-                    knot_dict[frame] = []
-                else:
-                    # knot is not tied correctly, further checks, but maximum 10 times
-                    counter = 0
-                    while counter < 10:
-                        kn = knot_type(result + 1, self.lx, self.closure, self.max_cross, self.tries)
-                        if kn != '0_1':
-                            check = check_after_knotting(result + 2, result + self.scope - 1, self.lx, self.closure,
-                                                         self.max_cross, self.tries)
-                            if check == 1:
-                                # knot find in this frame is correct
-                                knot_dict[result + 1] = []
-                                found = True
-                                break
-                            else:
-                                # knot is not tied correctly, further checks,
-                                result = check
-                                counter += 1
-                        else:
-                            # knot in the frame nr result+1 is an unknot
-                            counter += 1
-                            result += 2
-                    if not found:
-                        auxiliary_list.append(frame_index)
+            knotting_frame = self.knotting_result(frame)
+            if knotting_frame is not None:
+                knot_dict[knotting_frame] = []
             else:
                 auxiliary_list.append(frame_index)
 
         # calculating knot type
         for frame in knot_dict:
-            kn = knot_type(frame, self.lx, self.closure, self.max_cross, self.tries)
+            kn = knot_type(frame, self.lx, self.closure, self.max_cross, self.tries, self.cache)
             knot_dict[frame] = [kn]
 
         # updating the untied_list
@@ -357,21 +1095,9 @@ class Traj:
         for i, un_frame in enumerate(self.untied_list):
             if un_frame is None:
                 break
-            if check_knotting(un_frame + 1, un_frame + CHECK_LEN, PC_UNKNOTTING, self.lx, CHECK_LEN, self.closure,
-                              self.max_cross, self.tries):
+            if self.unknotting_result(un_frame):
                 frame = list(knot_dict.keys())[i]
                 knot_dict[frame].append(un_frame)
-            else:
-                find = True
-                next_frame = un_frame + 11
-                while find and next_frame + 10 < self.max_frame:
-                    if check_knotting(next_frame, next_frame + CHECK_LEN, PC_UNKNOTTING, self.lx, CHECK_LEN,
-                                      self.closure, self.max_cross, self.tries):
-                        frame = list(knot_dict.keys())[i]
-                        knot_dict[frame].append(un_frame)
-                        find = False
-                    else:
-                        next_frame += 11
 
         # Checking whether the last knot has a recorded untie moment or if it is tied until the end of the
         # and needs this information to be added.
@@ -381,6 +1107,67 @@ class Traj:
 
         return knot_dict
 
+    def knotting_result(self, frame):
+        """
+        Function checks the possible moment of knotting (see construct_knotdict): if there are enough unknotted frames
+        before it and if the knot is tied on scope frames after it. If the knot is not tied correctly, the next frames
+        are checked, but maximum 10 times. The results are memoized (and can be calculated by the shards of the
+        analysis).
+
+        Returns: the frame, in which the stable knot is formed, or None if it was not found.
+        """
+        if frame in self.knotting_results:
+            return self.knotting_results[frame]
+
+        knotting_frame = None
+        # check if there was no knot before the found frame
+        if check_knotting(frame - self.min_gap, frame - 1, PC_KNOTTING, self.lx, self.min_gap, self.closure,
+                          self.max_cross, self.tries, self.cache, self.states):
+            # check if knot is tied on the correct number of frames
+            result = check_after_knotting(frame + 1, frame + self.scope, self.lx, self.closure, self.max_cross,
+                                          self.tries, self.cache, self.states)
+            if result == 1:
+                knotting_frame = frame
+            else:
+                # knot is not tied correctly, further checks, but maximum 10 times
+                counter = 0
+                while counter < 10:
+                    kn = knot_type(result + 1, self.lx, self.closure, self.max_cross, self.tries, self.cache)
+                    if kn != '0_1':
+                        check = check_after_knotting(result + 2, result + self.scope - 1, self.lx, self.closure,
+                                                     self.max_cross, self.tries, self.cache, self.states)
+                        if check == 1:
+                            # knot find in this frame is correct
+                            knotting_frame = result + 1
+                            break
+                        else:
+                            # knot is not tied correctly, further checks,
+                            result = check
+                            counter += 1
+                    else:
+                        # knot in the frame nr result+1 is an unknot
+                        counter += 1
+                        result += 2
+
+        self.knotting_results[frame] = knotting_frame
+        return knotting_frame
+
+    def unknotting_result(self, un_frame):
+        """
+        Function checks the possible moment of unknotting (see construct_knotdict): if the knot is not tied on
+        PC_UNKNOTTING of CHECK_LEN frames after it, or in one of the following windows of CHECK_LEN frames. The
+        results are memoized (and can be calculated by the shards of the analysis).
+
+        Returns: True if the knot untied in the frame, False otherwise.
+        """
+        if un_frame not in self.unknotting_results:
+            self.unknotting_results[un_frame] = \
+                check_knotting(un_frame + 1, un_frame + CHECK_LEN, PC_UNKNOTTING, self.lx, CHECK_LEN, self.closure,
+                               self.max_cross, self.tries, self.cache, self.states) or \
+                check_unknotting(un_frame + 11, self.max_frame, 11, PC_UNKNOTTING, self.lx, CHECK_LEN, self.closure,
+                                 self.max_cross, self.tries, self.cache, self.states)
+        return self.unknotting_results[un_frame]
+
     def check_knot(self):
         """
         Function checks if the distance between the formation of the knot and its unknotting frame meets the condition
@@ -406,31 +1193,21 @@ class Traj:
         for the correct value in the next 10 frames. Incorrect values are written to the list 'keys_to_modify' and
         corrected at the end of the function.
         """
+        for frame in self.knot_dict:
+            # the knot cores of the frames processed before the resumed checkpoint are not calculated again
+            if frame not in self.knotcore_results:
+                self.knotcore_results[frame] = self.valid_knotcore(frame)
+                self.save_checkpoint(force=False)
+
         keys_to_modify = []
         for frame in self.knot_dict:
-            er = False
-            knotcore = knotcore_len(frame, self.lx, self.closure, self.tries, self.max_cross)
-            try:
-                if isinstance(knotcore, int):
-                    raise TypeError("Knot core value can not be 0.")
-                elif knotcore is None:
-                    raise ValueError("Knot core length must be greater than 6.")
-            except (TypeError, ValueError) as e:
-                if self.debug:
-                    print(f"Exception occurred: {e}. Analysis of frame {frame} is processed. Looking for the knot in "
-                          f"successive frames.")
-                er = True
-            if er:
-                # Invalid knot core in frame, looking for the correct value in subsequent frames, but maximum in 10
-                # frames
-                for i in range(frame + 1, frame + 10):
-                    knotcore = knotcore_len(i, self.lx, self.closure, self.tries, self.max_cross)
-                    if type(knotcore) is tuple:
-                        if knotcore[1] - knotcore[0] > 6:
-                            keys_to_modify.append((frame, i, knotcore))
-                            break
-            else:
+            if self.knotcore_results[frame] is None:
+                continue
+            new_frame, knotcore = self.knotcore_results[frame]
+            if new_frame == frame:
                 self.knot_dict[frame].append(knotcore)
+            else:
+                keys_to_modify.append((frame, new_frame, knotcore))
 
         # Modify the dictionary
         for old_frame, new_frame, knotcore_value in keys_to_modify:
@@ -441,6 +1218,41 @@ class Traj:
 
         self.knot_dict = dict(sorted(self.knot_dict.items()))
 
+    def valid_knotcore(self, frame):
+        """
+        Function calculates the knot core range in the knotting frame. If the value is invalid, it searches for the
+        correct value in the next 10 frames.
+
+        Returns: tuple (frame, knot core range) or None, if no valid knot core range was found.
+        """
+        er = False
+        knotcore = knotcore_len(frame, self.lx, self.closure, self.tries, self.max_cross, self.store,
+                                self.knotcore_search, adaptive=self.adaptive)
+        try:
+            if isinstance(knotcore, int):
+                raise TypeError("Knot core value can not be 0.")
+            elif knotcore is None:
+                raise ValueError("Knot core length must be greater than 6.")
+        except (TypeError, ValueError) as e:
+            if self.debug:
+                print(f"Exception occurred: {e}. Analysis of frame {frame} is processed. Looking for the knot in "
+                      f"successive frames.")
+            er = True
+        if not er:
+            return frame, knotcore
+
+        # Invalid knot core in frame, looking for the correct value in subsequent frames, but maximum in 10 frames
+        hint = None
+        for i in range(frame + 1, frame + 10):
+            knotcore = knotcore_len(i, self.lx, self.closure, self.tries, self.max_cross, self.store,
+                                    self.knotcore_search, hint, self.adaptive)
+            if type(knotcore) is tuple:
+                if self.warm_start:
+                    hint = knotcore
+                if knotcore[1] - knotcore[0] > 6:
+                    return i, knotcore
+        return None
+
     def specify_knotting_style(self):
         """
         The function evaluates the way of knotting, the behavior of the loop and inserts the results into the knot_dict.
@@ -3,12 +3,30 @@
 
 from packages.traj import *
 from packages.plot import Plot
+from packages.store import ResultStore
+from packages.checkpoint import Checkpoint
+from packages.shard import save_shard, load_shard
+from packages.profiler import Profiler, stage
+from packages.frames import LazyFrames, open_frame_store, is_ca_pdb, read_ca_pdb
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import argparse
+import csv
+import glob
+import json
+import os
+import time
+import traceback
 
 
 def analyze_trajectory(file, nterminus, top_file=None, nat_knotcore=None, min_gap=10, scope=10, min_knot=100,
                        closure=1, tries=20, max_cross=15, draw_plot=False, plot_filename="knotcore_plot",
-                       plot_scope=100, debug=False, full_output=False):
+                       plot_scope=100, debug=False, full_output=False, cache_size=None,
+                       store=None, workers=1, knotcore_search='linear',
+                       warm_start=False, lazy=False, chunk_size=1000, frame_index=False, search_mode='fixed',
+                       search_stride=None, prefilter=False, knot_engine='topoly', profile=False, trace_file=None,
+                       checkpoint=None, resume=False, adaptive=False, headless=False, plot_data=None, timeline=None,
+                       shard=None, halo=None, shard_output=None, shards=None):
     """
     Function finds frames in which knot forms based on the given conditions. It evaluates how the knot was
     formed (via slipknot/normally) and whether the loop was +/- in its place at the moment, when the knot was formed.
@@ -16,7 +34,9 @@ def analyze_trajectory(file, nterminus, top_file=None, nat_knotcore=None, min_ga
 
     Args:
         file (str):
-                The path to the structure in accepted format: .pdb, .xyz or .xtc.
+                The path to the structure in accepted format: .pdb, .xyz or .xtc, or to the binary frame store (.npy)
+                created with convert_trajectory.py. CA-only multi-model PDB files (coarse-grained trajectories) are
+                read with a fast reader, without building the full topology.
         nterminus (bool):
                 The end of a structure that goes through a loop when a knot is formed.
                 True: if closer to the N-terminus (N-terminus is the start of an amino acid chain (protein or
@@ -68,6 +88,132 @@ def analyze_trajectory(file, nterminus, top_file=None, nat_knotcore=None, min_ga
                 True, if full information with text.
                 False, if just the result.
                 Default: False
+        cache_size (int, optional):
+                The maximum number of frames, for which the calculated knot types are kept in memory during the
+                analysis. None means no limit. Limiting the cache keeps the memory flat on very long trajectories.
+                Default: None.
+        store (bool or str, optional):
+                Persistent store of the calculated knot types and knot core ranges, which is reused by the following
+                analyses of the same trajectory (e.g. with different min_gap, scope, min_knot or plot_scope).
+                True: the store is kept in the SQLite file next to the trajectory ('<file>.knots.sqlite').
+                str: the path to the SQLite file of the store.
+                Default: None (no store).
+        workers (int, optional):
+                The number of processes, which calculate the knot types of the frames searched in the trajectory
+                and the knot core values drawn on the plot. The results are the same as with one process.
+                Default: 1.
+        knotcore_search (str, optional):
+                How the boundaries of the knot core are searched.
+                'linear': atoms are cut from the ends one by one (the reference method).
+                'gallop': the boundaries are found with exponentially growing steps and bisection, which needs about
+                log(N) instead of N polynomial calculations per frame.
+                'batch': the same as 'linear', but the candidate sub-chains are passed to topoly in batches and every
+                sub-chain is calculated only once per frame.
+                Default: 'linear'.
+        warm_start (bool, optional):
+                If True, the knot core search in consecutive frames (the frames checked after an invalid knot core and
+                the frames sampled for the plot) starts from the knot core range of the previous frame, instead of the
+                whole chain. The whole chain is searched only when the previous range is not knotted.
+                Default: False.
+        lazy (bool, optional):
+                If True, the trajectory is not loaded into memory at once. The frames are decoded in chunks, only when
+                the analysis needs them, and only a few recently used chunks are kept in memory.
+                Default: False.
+        chunk_size (int, optional):
+                The number of frames decoded at once in the lazy mode.
+                Default: 1000.
+        frame_index (bool, optional):
+                If True, the frames of the .pdb or .xtc trajectory are read in the lazy mode with one seek, using the
+                byte offsets of the frames. The offsets are saved next to the trajectory ('<file>.frameidx.npy'), when
+                the trajectory is analyzed for the first time. Implies lazy=True.
+                Default: False.
+        search_mode (str, optional):
+                How the possible moments of knotting and unknotting are searched.
+                'fixed': every 100 frames, then every 10 and every 1 frame before the found frame.
+                'bisect': every search_stride frames, then the moment of change is located by bisection.
+                Default: 'fixed'.
+        search_stride (int, optional):
+                The stride of the coarse search in the 'bisect' mode. Knots existing for less frames can be missed.
+                Default: None, chosen from the length of the trajectory (1/200 of it, at least 10), but not greater
+                than min_knot.
+        prefilter (bool, optional):
+                If True, the frames are first checked with the cheap unknot certificate (the chain closed like by
+                topoly and reduced by the triangle elimination), and the Alexander polynomial is calculated only for
+                the frames, which it can not prove unknotted. Works only with closure 1.
+                Default: False.
+        knot_engine (str, optional):
+                How the knot types of the frames are calculated.
+                'topoly': every frame is passed to topoly.
+                'numpy': the built-in engine calculates the knot types of many frames at once with NumPy. It
+                recognizes the knots up to 6 crossings (0_1, 3_1, 4_1, 5_1, 5_2, 6_1, 6_2, 6_3), the other frames are
+                passed to topoly. Works only with closure 1.
+                Default: 'topoly'.
+        profile (bool, optional):
+                If True, the analysis is instrumented: the wall time of every stage, the numbers of calls of knot_type,
+                knotcore_len and alexander (of topoly), the total time in topoly, the number of the loaded frames and
+                the peak memory (of the process and, separately, of its largest worker process) are recorded. The
+                report is returned together with the results and printed in the debug mode.
+                Default: False.
+        trace_file (str, optional):
+                The path, where the timeline of the instrumented analysis is saved in the Chrome trace JSON format
+                (chrome://tracing, Perfetto). Implies profile=True.
+                Default: None.
+        checkpoint (bool or str, optional):
+                The state of the analysis (the results of its completed stages, the knot cores of the processed
+                knotting frames and the knot cores sampled for the plot) is saved to the state file during the
+                analysis, so the interrupted analysis can be resumed. The file is removed, when the analysis finishes.
+                True: the state file next to the trajectory ('<file>.checkpoint.pkl').
+                str: the path to the state file.
+                Default: None (no checkpoint).
+        resume (bool, optional):
+                If True, the analysis continues from the state saved in the checkpoint (by the interrupted analysis
+                with the same parameters) and gives the same results as the uninterrupted one. Implies
+                checkpoint=True, if the checkpoint is not given.
+                Default: False.
+        adaptive (bool, optional):
+                If True, the random closures (closure other than 1) are run in small batches and stopped, when the
+                leading knot type (and, for the knot cores, its probability against the thresholds of the decisions)
+                is statistically settled, otherwise all tries closures are run. The reported probabilities keep their
+                meaning (the fraction of the closures giving the knot type).
+                Default: False.
+        headless (bool, optional):
+                If True, the plot is only written to the html file, without opening it (e.g. on a computing node
+                without a display).
+                Default: False.
+        plot_data (bool or str, optional):
+                The results of the analysis and the knot core ranges sampled for the plot are saved in the compact
+                plot data file (.npz), from which the plot can be drawn again without the trajectory (see
+                Plot.from_file and draw_plot.py), e.g. to change its style.
+                True: the file named after the plot ('<plot_filename>.npz').
+                str: the path to the file.
+                Default: None (no file).
+        timeline (bool or str, optional):
+                The knot timeline (the knot type of every frame, see knot_timeline.py) is used to check the stability
+                of the found knots (the windows of min_gap, scope and 10 frames around the knotting and unknotting
+                frames), then every check takes a constant time. The results are the same as without it.
+                True: the timeline is calculated before the analysis (in the pool of the workers, it is fast with
+                knot_engine='numpy').
+                str: the path to the timeline of all frames (stride 1) saved by knot_timeline.py with the same
+                closure, tries, max_cross, knot_engine and adaptive, otherwise ValueError is raised.
+                Default: None (the frames are checked one by one).
+        shard (tuple, optional):
+                The pair (start, end): only the shard of the trajectory, the frames range(start, end), is analyzed
+                (see Traj.analyze_shard) and the result of the shard is returned instead of knot_dict (without the
+                plot). The shards covering the whole trajectory, analyzed in parallel processes or on many machines,
+                are merged by the analysis with shards.
+                Default: None (the whole trajectory).
+        halo (int, optional):
+                The number of the frames searched on both sides of the shard, at least min_gap + scope + min_knot
+                (the default).
+                Default: None.
+        shard_output (str, optional):
+                The path, where the result of the shard is saved (see save_shard).
+                Default: None.
+        shards (list, optional):
+                The results of the shards (or the paths to the files saved with shard_output) covering the whole
+                trajectory, analyzed with the same parameters. They are merged (see Traj.merge_shards) and the analysis
+                continues from them, with the same results as the analysis of the whole trajectory.
+                Default: None.
 
     Returns:
     Dictionary of frames, when a knot is tied as keys and as value the result of the analysis. The result
@@ -85,39 +231,332 @@ def analyze_trajectory(file, nterminus, top_file=None, nat_knotcore=None, min_ga
                             1 - loop is in place.
                             2 - loop expands.
 
+    If shard is given, the result of the shard (see Traj.analyze_shard).
+
+    If profile=True, the tuple (results, profile report) is returned, see Profiler.report.
+
     If plot=True, then plot of the knot core range for the entire trajectory of the molecule. If the 'plot_filename'
     parameter has not been changed, the file will be created in the current directory. Plot is saved in html format.
     """
     if debug:
         print('Analyzing the trajectory with parameters:\n' + str(locals()))
 
-    t = load_structure(file, top_file)
+    profiler = Profiler() if profile or trace_file is not None else None
+    if profiler is not None:
+        profiler.activate()
+    try:
+        with stage("load"):
+            lx, n_atoms = load_trajectory(file, top_file, lazy, chunk_size, frame_index)
+        if lx is None:
+            return None
+
+        result_store = None
+        if store:
+            result_store = ResultStore(ResultStore.sidecar_path(file) if store is True else store)
 
+        state = None
+        if shard is None and (checkpoint or resume):
+            state = Checkpoint(Checkpoint.sidecar_path(file) if checkpoint in (None, True) else checkpoint, resume)
+
+        trajectory = Traj(lx, n_atoms - 1, len(lx) - 1, min_gap, scope, min_knot, nterminus, nat_knotcore, closure,
+                          tries, max_cross, debug, cache_size, result_store, workers, knotcore_search, warm_start,
+                          search_mode, search_stride, prefilter, knot_engine, state, adaptive)
+
+        try:
+            if timeline is True:
+                with stage("knot_timeline"):
+                    trajectory.use_timeline(*trajectory.knot_timeline())
+            elif timeline:
+                with np.load(timeline) as saved:
+                    if "params" not in saved:
+                        raise ValueError(f"The timeline {timeline} does not contain its parameters, it has to be "
+                                         f"calculated again with knot_timeline.py.")
+                    trajectory.use_timeline(saved["codes"], tuple(saved["knot_types"]),
+                                            json.loads(str(saved["params"])))
+
+            if shard is not None:
+                with stage("analyze_shard"):
+                    knot_dict = trajectory.analyze_shard(*shard, halo)
+                if shard_output is not None:
+                    save_shard(shard_output, knot_dict)
+            else:
+                if shards is not None:
+                    trajectory.merge_shards([load_shard(result) if isinstance(result, str) else result
+                                             for result in shards])
+
+                knot_dict = trajectory.calculate(full_output)
+
+                traj_plot = Plot(trajectory, plot_filename, plot_scope, debug, headless)
+                if plot_data:
+                    with stage("prepare_data_to_plot"):
+                        traj_plot.prepare_data_to_plot()
+                    traj_plot.save_data(plot_filename + ".npz" if plot_data is True else plot_data)
+                if draw_plot:
+                    if len(knot_dict) != 0:
+                        traj_plot.draw_plot()
+                    elif debug:
+                        print("The program did not detect any knots in the molecule. \n"
+                              "Nothing to plot.")
+            if state is not None:
+                # the analysis is finished, there is nothing to resume
+                state.remove()
+        finally:
+            trajectory.pool.close()
+            if isinstance(lx, LazyFrames):
+                lx.close()
+            if result_store is not None:
+                result_store.close()
+    finally:
+        if profiler is not None:
+            profiler.deactivate()
+
+    if profiler is None:
+        return knot_dict
+    if isinstance(lx, LazyFrames):
+        profiler.frames_loaded = lx.loaded_frames
+    elif not isinstance(lx, np.memmap):
+        # the frame store is paged in by the operating system, the number of the read frames is not known
+        profiler.frames_loaded = len(lx)
+    if debug:
+        print(profiler.summary())
+    if trace_file is not None:
+        profiler.dump_trace(trace_file)
+    return knot_dict, profiler.report()
+
+
+def load_trajectory(file, top_file=None, lazy=False, chunk_size=1000, frame_index=False):
+    """
+    Function loads the frames of the trajectory for the analysis (see analyze_trajectory for the meaning of the
+    arguments).
+
+    Returns:
+        Tuple (frames, number of atoms). The frames are a list/array of the coordinates of the frames, the memory-mapped
+        frame store (.npy files) or LazyFrames. (None, None) if the trajectory could not be loaded.
+    """
+    lazy = lazy or frame_index
+    if check_file_extension(file) == ".npy":
+        lx = open_frame_store(file)
+        n_atoms = lx.shape[1]
+    elif lazy:
+        lx = LazyFrames(file, top_file, chunk_size, frame_index=frame_index)
+        n_atoms = lx.n_atoms
+    elif is_ca_pdb(file):
+        # coarse-grained trajectory, read without the general PDB parser
+        lx = read_ca_pdb(file)
+        n_atoms = lx.shape[1]
+    else:
+        t = load_structure(file, top_file)
+
+        try:
+            lx = list(t.xyz[::])
+        except AttributeError as e:
+            print("Error occurred during loading data: ", e, ".")
+            return None, None
+        n_atoms = t.n_atoms
+    return lx, n_atoms
+
+
+def read_batch_jobs(source, nterminus=True, nat_knotcore=None, top_file=None):
+    """
+    Function creates the list of trajectories to analyze in the batch.
+
+    Args:
+        source (str):
+                A glob pattern of the trajectory files (e.g. 'replicas/*.xtc') or the path to the manifest: a .json file
+                with the list of objects or a .csv file with the header, with the fields: file (required), nterminus,
+                nat_knotcore (two numbers, in .csv separated by a space) and top_file. Relative paths in the manifest
+                are relative to its directory.
+        nterminus, nat_knotcore, top_file:
+                The values used for the trajectories, for which they are not given in the manifest.
+
+    Returns: list of dictionaries with the keys: file, nterminus, nat_knotcore, top_file.
+    """
+    def parse_bool(value):
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "1", "yes")
+        return bool(value)
+
+    extension = check_file_extension(source)
+    if extension in (".json", ".csv"):
+        with open(source) as manifest:
+            if extension == ".json":
+                rows = json.load(manifest)
+            else:
+                rows = list(csv.DictReader(manifest))
+        base = os.path.dirname(source)
+    else:
+        rows = [{"file": file} for file in sorted(glob.glob(source))]
+        base = ""
+
+    jobs = []
+    for row in rows:
+        job_nat_knotcore = row.get("nat_knotcore") or nat_knotcore
+        if isinstance(job_nat_knotcore, str):
+            job_nat_knotcore = job_nat_knotcore.split()
+        job_top_file = row.get("top_file") or top_file
+        jobs.append({
+            "file": os.path.join(base, row["file"]),
+            "nterminus": parse_bool(row["nterminus"]) if row.get("nterminus") not in (None, "") else nterminus,
+            "nat_knotcore": tuple(int(x) for x in job_nat_knotcore) if job_nat_knotcore is not None else None,
+            "top_file": os.path.join(base, job_top_file) if job_top_file is not None else None})
+    return jobs
+
+
+# codes of the loop behavior of the plain output for the descriptions of the full output
+LOOP_BEHAVIORS = {"loop tightens": 0, "loop is in place": 1, "loop expands": 2}
+
+
+def analyze_job(job, options):
+    """
+    Function analyzes one trajectory of the batch. Errors are caught and reported in the result, so a failed
+    trajectory does not stop the batch.
+
+    Returns: dictionary with the job, the knot_dict (or None), the time of the analysis and the error (or None), and
+             the profile report, if the analysis is profiled.
+    """
+    start = time.perf_counter()
+    result = dict(job)
+    if options.get("draw_plot"):
+        # every trajectory gets its own plot file
+        options = dict(options, plot_filename=os.path.splitext(job["file"])[0] + "_" +
+                       options.get("plot_filename", "knotcore_plot"))
+    if options.get("trace_file") is not None:
+        options = dict(options, trace_file=os.path.splitext(job["file"])[0] + "_" +
+                       os.path.basename(options["trace_file"]))
+    if isinstance(options.get("plot_data"), str):
+        options = dict(options, plot_data=os.path.splitext(job["file"])[0] + "_" +
+                       os.path.basename(options["plot_data"]))
+    if isinstance(options.get("timeline"), str):
+        options = dict(options, timeline=os.path.splitext(job["file"])[0] + "_" +
+                       os.path.basename(options["timeline"]))
+    if isinstance(options.get("checkpoint"), str):
+        options = dict(options, checkpoint=os.path.splitext(job["file"])[0] + "_" +
+                       os.path.basename(options["checkpoint"]))
+    if isinstance(options.get("store"), str):
+        # the SQLite store is written by one process at a time, the parallel jobs must not share it
+        options = dict(options, store=os.path.splitext(job["file"])[0] + "_" + os.path.basename(options["store"]))
     try:
-        lx = list(t.xyz[::])
-    except AttributeError as e:
-        print("Error occurred during loading data: ", e, ".")
-        return None
+        knot_dict = analyze_trajectory(job["file"], job["nterminus"], job["top_file"], job["nat_knotcore"], **options)
+        if isinstance(knot_dict, tuple):
+            # the profiled analysis
+            knot_dict, result["profile"] = knot_dict
+        result["knot_dict"] = knot_dict
+        result["error"] = None
+    except Exception as e:
+        result["knot_dict"] = None
+        result["error"] = f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+    result["time"] = time.perf_counter() - start
+    return result
 
-    trajectory = Traj(lx, t.n_atoms - 1, len(lx) - 1, min_gap, scope, min_knot, nterminus, nat_knotcore, closure, tries,
-                      max_cross, debug)
 
-    knot_dict = trajectory.calculate(full_output)
+def analyze_isolated_job(job, options):
+    """
+    Function analyzes one trajectory of the batch in its own process (see analyze_job). If the process is terminated
+    abruptly (e.g. killed for the lack of memory), the failure is reported in the result of this trajectory only.
 
-    if draw_plot:
-        if len(knot_dict) != 0:
-            traj_plot = Plot(trajectory, plot_filename, plot_scope, debug)
-            traj_plot.draw_plot()
-        elif debug:
-            print("The program did not detect any knots in the molecule. \n"
-                  "Nothing to plot.")
+    Returns: dictionary with the result of the job (see analyze_job).
+    """
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(analyze_job, job, options).result()
+        except BrokenProcessPool as e:
+            return dict(job, knot_dict=None, error=f"{type(e).__name__}: {e}", time=time.perf_counter() - start)
 
-    return knot_dict
+
+def knot_values(values):
+    """
+    Function converts the values of the knot from the knot_dict, or from the dictionary of the full output (see
+    Traj.calculate), into the values of the plain output.
+
+    Returns: list [knot type, unknotting frame, knot core range, way of knotting, loop behavior], the values, which
+             were not rated, are None.
+    """
+    if not isinstance(values, dict):
+        return list(values) + [None] * (5 - len(values))
+    slipknot = values.get("Knotting via slipknot")
+    return [values.get("Knot type"), values.get("Unknotting frame"), values.get("Knot core range"),
+            None if slipknot is None else int(not slipknot), LOOP_BEHAVIORS.get(values.get("Loop behavior"))]
+
+
+def write_batch_results(results, output):
+    """
+    Function writes the aggregated results of the batch. If the output is a .csv file, there is one row for every
+    knot (or one row for the trajectory without knots or with an error), otherwise the results are written as JSON.
+    """
+    if check_file_extension(output) == ".csv":
+        with open(output, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["file", "time", "error", "knotting_frame", "knot_type", "unknotting_frame",
+                             "knotcore_begin", "knotcore_end", "way_of_knotting", "loop_behavior"])
+            for result in results:
+                first = [result["file"], f"{result['time']:.3f}", (result["error"] or "").split("\n")[0]]
+                knot_dict = result["knot_dict"] or {}
+                if len(knot_dict) == 0:
+                    writer.writerow(first)
+                for frame, values in knot_dict.items():
+                    values = knot_values(values)
+                    knotcore = values[2] if isinstance(values[2], tuple) else (None, None)
+                    writer.writerow(first + [frame, values[0], values[1], knotcore[0], knotcore[1], values[3],
+                                             values[4]])
+    else:
+        with open(output, "w") as json_file:
+            json.dump([dict(result, knot_dict={str(frame): values for frame, values in result["knot_dict"].items()}
+                            if result["knot_dict"] is not None else None) for result in results], json_file, indent=2)
+
+
+def analyze_batch(source, nterminus=True, nat_knotcore=None, top_file=None, workers=1, output=None, **options):
+    """
+    Function analyzes many trajectories (e.g. the replicas of one protein) in one process pool. The trajectories are
+    scheduled from the largest file (longest job first), so the pool is not left waiting for one long trajectory at
+    the end. The trajectory, which fails, is reported in the results, the batch is continued. With more workers, every
+    trajectory is analyzed in its own process, so also a process terminated abruptly fails only its trajectory.
+
+    Args:
+        source (str):
+                A glob pattern of the trajectory files or the path to the .json/.csv manifest with the per-file
+                nterminus, nat_knotcore and top_file (see read_batch_jobs).
+        nterminus, nat_knotcore, top_file:
+                Default values for the trajectories, for which they are not given in the manifest.
+        workers (int, optional):
+                The number of trajectories analyzed at the same time.
+                Default: 1.
+        output (str, optional):
+                The path to the file with the aggregated results: .csv (one row per knot) or .json.
+                Default: None, the results are only returned.
+        **options:
+                Other parameters of analyze_trajectory, common for all trajectories. The output files (plot_filename,
+                trace_file, plot_data, timeline, checkpoint) and the persistent store are separate for every
+                trajectory: the given name is prefixed with the name of the trajectory ('<file>_<name>'), because the
+                store is locked by the process writing to it.
+
+    Returns: list of the results in the order of the jobs, every result is a dictionary with the keys: file,
+             nterminus, nat_knotcore, top_file, knot_dict, time (in seconds) and error.
+    """
+    jobs = read_batch_jobs(source, nterminus, nat_knotcore, top_file)
+    order = sorted(range(len(jobs)), key=lambda j: os.path.getsize(jobs[j]["file"])
+                   if os.path.exists(jobs[j]["file"]) else 0, reverse=True)
+
+    results = [None] * len(jobs)
+    if workers <= 1:
+        for j in order:
+            results[j] = analyze_job(jobs[j], options)
+    else:
+        # every job has its own process, so a crashed process does not break the pool of the other jobs
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {j: executor.submit(analyze_isolated_job, jobs[j], options) for j in order}
+            for j, future in futures.items():
+                results[j] = future.result()
+
+    if output is not None:
+        write_batch_results(results, output)
+    return results
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Analysis of the trajectory.')
-    parser.add_argument('file', type=str, help='Path to the structure file in accepted format: .pdb, .xyz or .xtc.')
+    parser.add_argument('file', type=str, help='Path to the structure file in accepted format: .pdb, .xyz or .xtc,'
+                                               ' or to the frame store (.npy) created with convert_trajectory.py.')
     parser.add_argument('nterminus', type=bool, help='The end of a structure that goes through a loop when a knot is '
                                                      'formed. True if closer to N-terminus, False if closer to '
                                                      'C-terminus.')
@@ -151,11 +590,116 @@ if __name__ == "__main__":
                                                                           ' plotted on the graph.')
     parser.add_argument('-e', '--debug', action='store_true', help='Enable debug mode.')
     parser.add_argument('-f', '--full_output', action='store_true', help='Display full analysis results.')
+    parser.add_argument('--cache_size', type=int, default=None, help='Maximum number of frames, for which the knot type'
+                                                                      ' is kept in memory. No limit by default.')
+    parser.add_argument('--store', nargs='?', const=True, default=None,
+                        help='Keep the calculated knot types and knot core ranges in a persistent SQLite store and'
+                             ' reuse them in the next runs. Optionally the path to the store, by default the file'
+                             ' next to the trajectory (in the batch, every trajectory has its own store).')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='Number of processes used to calculate the knot'
+                                                                     ' types of the searched frames and the knot cores'
+                                                                     ' on the plot.')
+    parser.add_argument('--knotcore_search', choices=['linear', 'gallop', 'batch'], default='linear',
+                        help='Method of searching the knot core boundaries: cutting atoms one by one (linear), with'
+                             ' exponentially growing steps and bisection (gallop) or one by one, with the candidate'
+                             ' sub-chains passed to topoly in batches (batch).')
+    parser.add_argument('--warm_start', action='store_true',
+                        help='Start the knot core search in consecutive frames from the knot core of the previous one.')
+    parser.add_argument('--lazy', action='store_true',
+                        help='Decode the frames in chunks, only when they are needed, instead of loading the whole'
+                             ' trajectory into memory.')
+    parser.add_argument('--chunk_size', type=int, default=1000, help='Number of frames decoded at once in the lazy'
+                                                                     ' mode.')
+    parser.add_argument('--frame_index', action='store_true',
+                        help='Read the frames of .pdb/.xtc files lazily with one seek, using the index of the frame'
+                             ' offsets saved next to the trajectory.')
+
+    parser.add_argument('--search_mode', choices=['fixed', 'bisect'], default='fixed',
+                        help='Search of the knotting moments: every 100, 10 and 1 frames (fixed) or every search_stride'
+                             ' frames and bisection (bisect).')
+    parser.add_argument('--search_stride', type=int, default=None,
+                        help='Stride of the coarse search in the bisect mode. By default chosen from the length of'
+                             ' the trajectory.')
+    parser.add_argument('--prefilter', action='store_true',
+                        help='Prove the plainly unknotted frames with a cheap geometric reduction, before the Alexander'
+                             ' polynomial is calculated (closure 1 only). Pays off, when the trajectory has many'
+                             ' unknotted frames, on the knotted frames the reduction costs about a sixth of the'
+                             ' polynomial.')
+    parser.add_argument('--knot_engine', choices=['topoly', 'numpy'], default='topoly',
+                        help='Calculate the knot types by topoly or by the built-in NumPy engine, which evaluates many'
+                             ' frames at once (closure 1 only).')
+    parser.add_argument('--profile', action='store_true',
+                        help='Record the time of every stage of the analysis, the numbers of calls of knot_type,'
+                             ' knotcore_len and topoly, the loaded frames and the peak memory of the process and of its'
+                             ' largest worker, and print the report.')
+    parser.add_argument('--trace_file', type=str, default=None,
+                        help='Save the timeline of the profiled analysis in the Chrome trace JSON format (implies'
+                             ' --profile).')
+    parser.add_argument('--checkpoint', nargs='?', const=True, default=None,
+                        help='Save the state of the analysis during the analysis, so it can be resumed after an'
+                             ' interruption. Optionally the path to the state file, by default the file next to the'
+                             ' trajectory.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the interrupted analysis from the state saved with --checkpoint.')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Stop the random closures early, when the knot type is statistically settled, instead of'
+                             ' running all --tries closures.')
+    parser.add_argument('--headless', action='store_true',
+                        help='Only write the plot to the html file, without opening it.')
+    parser.add_argument('--plot_data', nargs='?', const=True, default=None,
+                        help='Save the results and the knot cores of the plot in the compact .npz file, from which the'
+                             ' plot can be drawn again with draw_plot.py. Optionally the path to the file, by default'
+                             ' the name of the plot with the .npz extension.')
+    parser.add_argument('--timeline', nargs='?', const=True, default=None,
+                        help='Check the stability of the found knots using the knot type of every frame, calculated'
+                             ' before the analysis or, optionally, read from the timeline file saved by'
+                             ' knot_timeline.py.')
+    parser.add_argument('--shard', nargs=2, type=int, default=None, metavar=('START', 'END'),
+                        help='Analyze only the frames from START to END (exclusive) of the trajectory, the shards are'
+                             ' merged with --merge.')
+    parser.add_argument('--halo', type=int, default=None,
+                        help='The number of frames searched on both sides of the shard, at least min_gap + scope +'
+                             ' min_knot (the default).')
+    parser.add_argument('--shard_output', type=str, default=None, help='File with the result of the shard.')
+    parser.add_argument('--merge', nargs='+', type=str, default=None, metavar='SHARD_FILE',
+                        help='Merge the results of the shards (saved with --shard_output) covering the whole'
+                             ' trajectory and finish the analysis.')
+    parser.add_argument('-b', '--batch', action='store_true',
+                        help='Analyze many trajectories: the file is a glob pattern (in quotes) or a .json/.csv'
+                             ' manifest with the fields file, nterminus, nat_knotcore and top_file. The trajectories'
+                             ' are analyzed in the pool of --workers processes.')
+    parser.add_argument('-r', '--batch_output', type=str, default=None,
+                        help='File with the aggregated results of the batch (.csv or .json).')
 
     args = parser.parse_args()
-    nat_tuple = tuple(args.nat_knotcore)
+    nat_tuple = tuple(args.nat_knotcore) if args.nat_knotcore is not None else None
 
-    res = analyze_trajectory(args.file, args.nterminus, args.top_file, nat_tuple, args.min_gap, args.scope,
-                             args.min_knot, args.closure, args.tries, args.max_cross, args.draw_plot,
-                             args.plot_filename, args.plot_scope, args.debug, args.full_output)
-    print(res)
+    if args.batch:
+        res = analyze_batch(args.file, args.nterminus, nat_tuple, args.top_file, args.workers, args.batch_output,
+                            min_gap=args.min_gap, scope=args.scope, min_knot=args.min_knot, closure=args.closure,
+                            tries=args.tries, max_cross=args.max_cross, draw_plot=args.draw_plot,
+                            plot_filename=args.plot_filename, plot_scope=args.plot_scope, debug=args.debug,
+                            full_output=args.full_output, cache_size=args.cache_size, store=args.store,
+                            knotcore_search=args.knotcore_search, warm_start=args.warm_start, lazy=args.lazy,
+                            chunk_size=args.chunk_size, frame_index=args.frame_index,
+                            search_mode=args.search_mode, search_stride=args.search_stride,
+                            prefilter=args.prefilter, knot_engine=args.knot_engine, profile=args.profile,
+                            trace_file=args.trace_file, checkpoint=args.checkpoint, resume=args.resume,
+                            adaptive=args.adaptive, headless=args.headless,
+                            plot_data=args.plot_data, timeline=args.timeline)
+        for result in res:
+            print(result["file"], f"{result['time']:.1f} s", result["error"].split("\n")[0] if result["error"]
+                  else result["knot_dict"])
+    else:
+        res = analyze_trajectory(args.file, args.nterminus, args.top_file, nat_tuple, args.min_gap, args.scope,
+                                 args.min_knot, args.closure, args.tries, args.max_cross, args.draw_plot,
+                                 args.plot_filename, args.plot_scope, args.debug, args.full_output, args.cache_size,
+                                 args.store, args.workers, args.knotcore_search, args.warm_start, args.lazy,
+                                 args.chunk_size, args.frame_index, args.search_mode, args.search_stride,
+                                 args.prefilter, args.knot_engine, args.profile, args.trace_file, args.checkpoint,
+                                 args.resume, args.adaptive, args.headless, args.plot_data,
+                                 args.timeline, args.shard, args.halo, args.shard_output, args.merge)
+        if isinstance(res, tuple):
+            res, report = res
+            print(json.dumps(report, indent=2))
+        print(res)